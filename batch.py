@@ -0,0 +1,279 @@
+import numpy as np
+
+from exceptions import *
+from game import DalaGame
+
+_keys = {}
+
+
+def zobrist_arrays(rules):
+    '''the Zobrist keys of rules as uint64 arrays of pieces, remains, lost
+    and turn, the last indexed by a turn of 0, 1 or DalaGame.empty'''
+
+    arrays = _keys.get(rules)
+    if arrays is None:
+        turn = rules.turn_keys
+        arrays = _keys[rules] = (
+            np.array(rules.piece_keys, dtype=np.uint64),
+            np.array(rules.remains_keys, dtype=np.uint64),
+            np.array(rules.lost_keys, dtype=np.uint64),
+            np.array([turn[0], turn[1], turn[DalaGame.empty]],
+                     dtype=np.uint64))
+    return arrays
+
+
+class BatchDalaGame(object):
+    '''N independent games stepped in lockstep
+
+    Positions are (N, 2) integer arrays where a row of -1 stands for None:
+    drops have a source of -1, actions without capture have a capture of -1
+    and games whose destination is -1 are left untouched for this step.
+    Apart from the capture checks, actions are expected to be legal, e.g.
+    taken from game(i).legal_actions().
+
+    Move-phase games are drawn by the rules of DalaGame: quiet[i] counts the
+    moves since the last drop or capture and seen[i, :quiet[i] + 1] holds
+    the hashes of the positions they led to.
+    '''
+
+    def __init__(self,
+                 n,
+                 repetition_limit=None,
+                 no_capture_limit=None,
+                 rules=None):
+        if rules is None:
+            rules = DalaGame.rules
+        size = rules.size
+        self.n = n
+        self.rules = rules
+        self.boards = np.full((n, size, size), DalaGame.empty, dtype=np.int8)
+        self.remains = np.full((n, 2), rules.num_of_pieces, dtype=np.int8)
+        self.lost = np.zeros((n, 2), dtype=np.int8)
+        self.turn = np.zeros(n, dtype=np.int8)
+        self.winners = np.full(n, DalaGame.empty, dtype=np.int8)
+
+        if repetition_limit is None:
+            repetition_limit = DalaGame.repetition_limit
+        if no_capture_limit is None:
+            no_capture_limit = DalaGame.no_capture_limit
+        self.repetition_limit = repetition_limit
+        self.no_capture_limit = no_capture_limit
+        self.quiet = np.zeros(n, dtype=np.intp)
+        self.seen = np.zeros((n, 16), dtype=np.uint64)
+
+    @classmethod
+    def from_games(cls, games):
+        '''batch games sharing the draw limits and rules of the first one'''
+
+        if games:
+            batch = cls(len(games), games[0].repetition_limit,
+                        games[0].no_capture_limit, games[0].rules)
+        else:
+            batch = cls(0)
+
+        for i, game in enumerate(games):
+            batch.boards[i] = game.board()
+            batch.remains[i] = [game.remains(0), game.remains(1)]
+            batch.lost[i] = [game.lost(0), game.lost(1)]
+            batch.turn[i] = game.whos_turn()
+            winner = game.winner()
+            batch.winners[i] = DalaGame.empty if winner is None else winner
+
+            keys = [key for key, count in game._seen.items()
+                    for _ in range(count)]
+            batch._reserve(len(keys))
+            batch.seen[i, :len(keys)] = keys
+            batch.quiet[i] = game.quiet_moves()
+        return batch
+
+    def game(self, i):
+        winner = int(self.winners[i])
+        game = DalaGame(board=self.boards[i].tolist(),
+                        remains=self.remains[i].tolist(),
+                        lost=self.lost[i].tolist(),
+                        turn=int(self.turn[i]),
+                        winner=None if winner == DalaGame.empty else winner,
+                        repetition_limit=self.repetition_limit,
+                        no_capture_limit=self.no_capture_limit,
+                        rules=self.rules)
+
+        if game._seen:
+            quiet = int(self.quiet[i])
+            seen = {}
+            for key in self.seen[i, :quiet + 1].tolist():
+                seen[key] = seen.get(key, 0) + 1
+            game._seen = seen
+            game._quiet = quiet
+        return game
+
+    def game_over(self):
+        return (self.winners != DalaGame.empty) | (self.turn == DalaGame.empty)
+
+    def draws(self):
+        return (self.winners == DalaGame.empty) & (self.turn == DalaGame.empty)
+
+    def game_modes(self):
+        players = np.maximum(self.turn, 0)
+        remains = self.remains[np.arange(self.n), players]
+        return np.where(self.game_over(), DalaGame.end_mode,
+                        np.where(remains > 0, DalaGame.drop_mode,
+                                 DalaGame.move_mode))
+
+    def step(self, sources, destinations, captures):
+        sources = np.asarray(sources, dtype=np.intp).reshape(self.n, 2)
+        destinations = np.asarray(destinations,
+                                  dtype=np.intp).reshape(self.n, 2)
+        captures = np.asarray(captures, dtype=np.intp).reshape(self.n, 2)
+
+        games = np.flatnonzero(~self.game_over() & (destinations[:, 0] >= 0))
+        if len(games) == 0:
+            return
+
+        k = np.arange(len(games))
+        players = self.turn[games]
+        opponents = 1 - players
+        src = sources[games]
+        dst = destinations[games]
+        cap = captures[games]
+        moves = src[:, 0] >= 0
+        drops = ~moves
+        wants = cap[:, 0] >= 0
+
+        boards = self.boards[games]
+        boards[k[moves], src[moves, 0], src[moves, 1]] = DalaGame.empty
+        boards[k, dst[:, 0], dst[:, 1]] = players
+
+        own = boards == players[:, None, None]
+        captured = self._through_captures(own, dst)
+        captured[moves] |= self._beside_captures(own[moves], src[moves])
+
+        self._check_captures(games, captured, wants)
+
+        targets = boards[k[wants], cap[wants, 0], cap[wants, 1]]
+        wrong = targets != opponents[wants]
+        if np.any(wrong):
+            raise IllegalCapturePositionException(
+                'Opponent\'s piece doesn\'t exist in capture position in games {}'.format(
+                    games[wants][wrong].tolist()))
+
+        boards[k[wants], cap[wants, 0], cap[wants, 1]] = DalaGame.empty
+
+        self.boards[games] = boards
+        self.remains[games[drops], players[drops]] -= 1
+        self.lost[games[wants], opponents[wants]] += 1
+
+        over = self.lost[games, opponents] >= self.rules.lost_condition
+        over |= ((self.remains[games, opponents] == 0) &
+                 self._immobile(boards, opponents))
+        self.winners[games[over]] = players[over]
+        self.turn[games] = np.where(over, DalaGame.empty, opponents)
+
+        record = ~over & (self.remains[games] == 0).all(axis=1)
+        if np.any(record):
+            self._record(games[record], (drops | wants)[record])
+
+    def step_actions(self, actions):
+        '''step with a list of Action or None, one per game'''
+
+        positions = np.full((3, self.n, 2), -1, dtype=np.intp)
+        for i, action in enumerate(actions):
+            if action is None:
+                continue
+            for j, position in enumerate(action):
+                if position is not None:
+                    positions[j, i] = position
+
+        self.step(*positions)
+
+    def _record(self, games, irreversible):
+        '''count the new move-phase positions and end drawn games'''
+
+        quiet = np.where(irreversible, 0, self.quiet[games] + 1)
+        self.quiet[games] = quiet
+        self._reserve(quiet.max() + 1)
+
+        keys = self._hashes(games)
+        self.seen[games, quiet] = keys
+        valid = np.arange(self.seen.shape[1]) <= quiet[:, None]
+        counts = ((self.seen[games] == keys[:, None]) & valid).sum(axis=1)
+
+        drawn = np.zeros(len(games), dtype=bool)
+        if self.repetition_limit > 0:
+            drawn |= counts >= self.repetition_limit
+        if self.no_capture_limit > 0:
+            drawn |= quiet >= self.no_capture_limit
+        self.turn[games[drawn]] = DalaGame.empty
+
+    def _reserve(self, width):
+        while self.seen.shape[1] < width:
+            self.seen = np.concatenate([self.seen, np.zeros_like(self.seen)],
+                                       axis=1)
+
+    def _hashes(self, games):
+        '''Zobrist keys of games, equal to DalaGame.hash()'''
+
+        piece_keys, remains_keys, lost_keys, turn_keys = zobrist_arrays(
+            self.rules)
+        cells = self.boards[games].reshape(len(games), -1)
+        zero = np.uint64(0)
+        keys = (np.where(cells == 0, piece_keys[0], zero) ^
+                np.where(cells == 1, piece_keys[1], zero))
+        h = np.bitwise_xor.reduce(keys, axis=1)
+
+        for player in range(2):
+            h ^= remains_keys[player][self.remains[games, player]]
+            h ^= lost_keys[player][self.lost[games, player]]
+        return h ^ turn_keys[self.turn[games]]
+
+    def _check_captures(self, games, captured, wants):
+        missing = captured & ~wants
+        if np.any(missing):
+            raise MustCaptureException('Must capture in games {}'.format(
+                games[missing].tolist()))
+
+        extra = wants & ~captured
+        if np.any(extra):
+            raise MustNotCaptureException(
+                'Must not capture in games {}'.format(games[extra].tolist()))
+
+    def _immobile(self, boards, players):
+        '''whether no piece of players has an empty orthogonal neighbour'''
+
+        own = boards == players[:, None, None]
+        empty = boards == DalaGame.empty
+        movable = ((own[:, 1:, :] & empty[:, :-1, :]).any(axis=(1, 2)) |
+                   (own[:, :-1, :] & empty[:, 1:, :]).any(axis=(1, 2)) |
+                   (own[:, :, 1:] & empty[:, :, :-1]).any(axis=(1, 2)) |
+                   (own[:, :, :-1] & empty[:, :, 1:]).any(axis=(1, 2)))
+        return ~movable
+
+    def _through_captures(self, own, positions):
+        '''three connected pieces through positions'''
+
+        rows = (self._run(own, positions, 0, 1) +
+                self._run(own, positions, 0, -1) + 1)
+        cols = (self._run(own, positions, 1, 0) +
+                self._run(own, positions, -1, 0) + 1)
+        return (rows == 3) | (cols == 3)
+
+    def _beside_captures(self, own, positions):
+        '''three connected pieces next to positions'''
+
+        captured = np.zeros(len(positions), dtype=bool)
+        for dr, dc in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+            captured |= self._run(own, positions, dr, dc) == 3
+        return captured
+
+    def _run(self, own, positions, dr, dc):
+        '''length of the run of own pieces starting next to positions'''
+
+        size = self.rules.size
+        steps = np.arange(1, size)
+        rows = positions[:, :1] + dr * steps
+        cols = positions[:, 1:] + dc * steps
+        inside = (rows >= 0) & (rows < size) & (cols >= 0) & (cols < size)
+
+        cells = own[np.arange(len(positions))[:, None],
+                    np.clip(rows, 0, size - 1),
+                    np.clip(cols, 0, size - 1)] & inside
+        return np.cumprod(cells, axis=1).sum(axis=1)
@@ -0,0 +1,167 @@
+from game import DalaGame, line_tables
+
+
+def build_lines(size):
+    '''turn the capture lines of game.line_tables() into bit masks'''
+
+    def mask(cells):
+        bits = 0
+        for r, c in cells:
+            bits |= 1 << (r * size + c)
+        return bits
+
+    through, beside, _ = line_tables(size)
+    return tuple(
+        tuple(tuple((mask(segment), mask(fence)) for segment, fence in lines)
+              for lines in table) for table in (through, beside))
+
+
+class Masks(object):
+    '''bit mask tables of one board size'''
+
+    def __init__(self, size):
+        self.through_lines, self.beside_lines = build_lines(size)
+        self.neighbours = tuple(
+            sum(1 << (r * size + c) for r, c in cells)
+            for cells in line_tables(size)[2])
+        self.full = (1 << size * size) - 1
+        self.first_column = sum(1 << (r * size) for r in range(size))
+        self.last_column = self.first_column << (size - 1)
+
+
+_masks = {}
+
+
+def bit_masks(rules):
+    '''the Masks of rules, built once per board size'''
+
+    result = _masks.get(rules.size)
+    if result is None:
+        result = _masks[rules.size] = Masks(rules.size)
+    return result
+
+
+class BitboardDalaGame(DalaGame):
+    '''DalaGame storing each player's pieces as a single integer
+
+    Cell (r, c) is bit r * size + c, so occupancy and capture tests are a
+    handful of mask operations instead of list walks.
+    '''
+
+    masks = bit_masks(DalaGame.rules)
+
+    def _init_board(self, board):
+        if self.rules is not DalaGame.rules:
+            self.masks = bit_masks(self.rules)
+
+        pieces = [0, 0]
+        if board is not None:
+            for r, row in enumerate(board):
+                for c, value in enumerate(row):
+                    if value != DalaGame.empty:
+                        pieces[value] |= 1 << (r * self.size + c)
+
+        self._pieces = pieces
+
+    def copy(self):
+        game = BitboardDalaGame(remains=self._remains,
+                                lost=self._lost,
+                                turn=self._turn,
+                                winner=self._winner,
+                                repetition_limit=self.repetition_limit,
+                                no_capture_limit=self.no_capture_limit,
+                                rules=self.rules)
+        game._pieces = list(self._pieces)
+        game._hash = self._hash
+        game._mobility = list(self._mobility)
+        game._seen = dict(self._seen)
+        game._quiet = self._quiet
+        return game
+
+    def _same_board(self, other):
+        if isinstance(other, BitboardDalaGame):
+            return self._pieces == other._pieces
+        else:
+            return self.board() == other.board()
+
+    def board(self):
+        return [[self._get(r, c) for c in range(self.size)]
+                for r in range(self.size)]
+
+    def _positions_of(self, value):
+        if value == DalaGame.empty:
+            bits = self.masks.full & ~(self._pieces[0] | self._pieces[1])
+        else:
+            bits = self._pieces[value]
+
+        size = self.size
+        positions = []
+        while bits:
+            low = bits & -bits
+            positions.append(divmod(low.bit_length() - 1, size))
+            bits ^= low
+
+        return positions
+
+    def _get(self, r, c):
+        bit = 1 << (r * self.size + c)
+        if self._pieces[0] & bit:
+            return 0
+        elif self._pieces[1] & bit:
+            return 1
+        else:
+            return DalaGame.empty
+
+    def _set(self, r, c, value):
+        bit = 1 << (r * self.size + c)
+        self._pieces[0] &= ~bit
+        self._pieces[1] &= ~bit
+
+        if value != DalaGame.empty:
+            self._pieces[value] |= bit
+
+    def _place(self, r, c, player):
+        cell = r * self.size + c
+        pieces = self._pieces
+        neighbours = self.masks.neighbours[cell]
+
+        mobility = self._mobility
+        mobility[player] += (neighbours & ~(pieces[0] | pieces[1])).bit_count()
+        mobility[0] -= (neighbours & pieces[0]).bit_count()
+        mobility[1] -= (neighbours & pieces[1]).bit_count()
+
+        pieces[player] |= 1 << cell
+        self._hash ^= self.rules.piece_keys[player][cell]
+
+    def _remove(self, r, c, player):
+        cell = r * self.size + c
+        pieces = self._pieces
+        pieces[player] &= ~(1 << cell)
+        self._hash ^= self.rules.piece_keys[player][cell]
+
+        neighbours = self.masks.neighbours[cell]
+        mobility = self._mobility
+        mobility[player] -= (neighbours & ~(pieces[0] | pieces[1])).bit_count()
+        mobility[0] += (neighbours & pieces[0]).bit_count()
+        mobility[1] += (neighbours & pieces[1]).bit_count()
+
+    def _is_move_capture(self, player, source, destination):
+        if self._is_drop_capture(player, destination):
+            return True
+
+        own = self._pieces[player]
+        lines = self.masks.beside_lines[source[0] * self.size + source[1]]
+        for segment, fence in lines:
+            if own & segment == segment and not own & fence:
+                return True
+
+        return False
+
+    def _is_drop_capture(self, player, position):
+        own = self._pieces[player]
+        lines = self.masks.through_lines[position[0] * self.size + position[1]]
+        for segment, fence in lines:
+            if own & segment == segment and not own & fence:
+                return True
+
+        return False
@@ -0,0 +1,159 @@
+import argparse
+import bisect
+import concurrent.futures
+import mmap
+import os
+import struct
+
+from engine import Engine
+from game import Action, DalaGame
+
+_MAGIC = b'DALABK1\0'
+_HEADER = struct.Struct('<8sBI')
+# canonical hash, source, destination, capture, score
+_RECORD = struct.Struct('<QBBBxi')
+_NONE = 255
+
+
+class OpeningBook(object):
+    '''sorted book records read through mmap
+
+    Records are keyed by the hash of the canonical form of a position, so
+    every symmetric variant of a stored position is found as well.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, size, self._count = _HEADER.unpack_from(self._data)
+        if magic != _MAGIC or size != DalaGame.size:
+            self.close()
+            raise ValueError('Not a matching opening book: ' + path)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        '''key of the i-th record, for bisect'''
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return _RECORD.unpack_from(self._data,
+                                   _HEADER.size + i * _RECORD.size)[0]
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def lookup(self, game):
+        '''return [(action, score)] for game, best first'''
+
+        if game.rules is not DalaGame.rules:
+            return []
+
+        canonical, transform = game.canonical()
+        key = canonical.hash()
+
+        moves = []
+        i = bisect.bisect_left(self, key)
+        while i < self._count:
+            record = _RECORD.unpack_from(self._data,
+                                         _HEADER.size + i * _RECORD.size)
+            if record[0] != key:
+                break
+
+            action = Action(*(_decode_position(cell) for cell in record[1:4]))
+            moves.append((transform.inverse_action(action), record[4]))
+            i += 1
+
+        moves.sort(key=lambda move: -move[1])
+        return moves
+
+
+def drop_positions(plies):
+    '''canonical drop-phase positions reachable in at most plies actions'''
+
+    games = {}
+    frontier = [DalaGame()]
+    for ply in range(plies + 1):
+        next_frontier = []
+        for game in frontier:
+            canonical, _ = game.canonical()
+            if canonical.hash() in games:
+                continue
+            games[canonical.hash()] = canonical
+
+            if ply < plies and canonical.game_mode() == DalaGame.drop_mode:
+                for action in canonical.legal_actions():
+                    child = canonical.copy()
+                    child.apply(action)
+                    next_frontier.append(child)
+        frontier = next_frontier
+
+    return list(games.values())
+
+
+def build(path, plies=6, depth=4, time_limit=None, workers=None):
+    '''search every early drop-phase position and write the book to path'''
+
+    games = [game for game in drop_positions(plies)
+             if game.game_mode() == DalaGame.drop_mode]
+    jobs = [(game, depth, time_limit) for game in games]
+
+    if workers == 1:
+        results = list(map(_search, jobs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers) as executor:
+            results = list(executor.map(_search, jobs, chunksize=16))
+
+    records = sorted(((game.hash(), ) + result
+                      for game, result in zip(games, results)
+                      if result is not None),
+                     key=lambda record: record[0])
+
+    partial = path + '.part'
+    with open(partial, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, DalaGame.size, len(records)))
+        for key, action, score in records:
+            f.write(
+                _RECORD.pack(key, *(_encode_position(p) for p in action),
+                             score))
+    os.replace(partial, path)
+
+    return len(records)
+
+
+def _search(job):
+    game, depth, time_limit = job
+    result = Engine().search(game, depth, time_limit)
+    if result.action is None:
+        return None
+    return result.action, result.score
+
+
+def _encode_position(position):
+    if position is None:
+        return _NONE
+    return position[0] * DalaGame.size + position[1]
+
+
+def _decode_position(cell):
+    if cell == _NONE:
+        return None
+    return divmod(cell, DalaGame.size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a Dala opening book')
+    parser.add_argument('path')
+    parser.add_argument('--plies', type=int, default=6)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--time-limit', type=float, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    count = build(args.path, args.plies, args.depth, args.time_limit,
+                  args.workers)
+    print('{} positions written to {}'.format(count, args.path))
@@ -0,0 +1,262 @@
+import os
+
+from game import Action, DalaGame
+
+_RECORD_MAGIC = b'DALAGR1\0'
+_GAME, _ACTIONS, _CHECKPOINT, _END = b'G', b'A', b'C', b'E'
+_NONE = 255
+
+_state_sizes = {}
+
+
+def state_size(rules=None):
+    '''bytes taken by encode() of a game of rules, the standard by default'''
+
+    if rules is None:
+        rules = DalaGame.rules
+
+    size = _state_sizes.get(rules)
+    if size is None:
+        states = (3**(rules.size * rules.size) * (rules.num_of_pieces + 1)**4 *
+                  3 * 3)
+        size = _state_sizes[rules] = ((states - 1).bit_length() + 7) // 8
+    return size
+
+
+STATE_SIZE = state_size()
+
+
+def encode(game):
+    '''pack a game into state_size(game.rules) bytes
+
+    The cells, remains, lost, turn and winner are digits of one mixed radix
+    number.
+    '''
+
+    rules = game.rules
+    pieces = rules.num_of_pieces + 1
+
+    value = 0
+    for row in game.board():
+        for cell in row:
+            value = value * 3 + cell + 1
+
+    for player in range(2):
+        value = value * pieces + game.remains(player)
+        value = value * pieces + game.lost(player)
+
+    value = value * 3 + game.whos_turn() + 1
+
+    winner = game._winner
+    value = value * 3 + (0 if winner is None else winner + 1)
+
+    return value.to_bytes(state_size(rules), 'little')
+
+
+def decode(data, game_class=DalaGame, rules=None):
+    if rules is None:
+        rules = DalaGame.rules
+    pieces = rules.num_of_pieces + 1
+    size = rules.size
+
+    value = int.from_bytes(data[:state_size(rules)], 'little')
+
+    value, winner = divmod(value, 3)
+    value, turn = divmod(value, 3)
+
+    remains = [0, 0]
+    lost = [0, 0]
+    for player in (1, 0):
+        value, lost[player] = divmod(value, pieces)
+        value, remains[player] = divmod(value, pieces)
+
+    cells = []
+    for _ in range(size * size):
+        value, cell = divmod(value, 3)
+        cells.append(cell - 1)
+    cells.reverse()
+
+    return game_class(board=[cells[r * size:(r + 1) * size]
+                             for r in range(size)],
+                      remains=remains,
+                      lost=lost,
+                      turn=turn - 1,
+                      winner=None if winner == 0 else winner - 1,
+                      rules=rules)
+
+
+class GameRecordWriter(object):
+    '''append games to a record file, flushing in bulk
+
+    Each game is its initial state followed by blocks of at most
+    checkpoint_interval actions, each block followed by the state it leads
+    to, so a reader can check or resume from any block. All games of a file
+    follow the same rules, which the reader has to be given too.
+    '''
+
+    def __init__(self,
+                 path,
+                 checkpoint_interval=32,
+                 buffer_size=1 << 16,
+                 rules=None):
+        if not 0 < checkpoint_interval <= 255:
+            raise ValueError('checkpoint_interval must be within 1 and 255')
+        if rules is None:
+            rules = DalaGame.rules
+        if rules.size * rules.size > _NONE:
+            raise ValueError('{}x{} boards do not fit a game record'.format(
+                rules.size, rules.size))
+
+        self.path = path
+        self.rules = rules
+        self.checkpoint_interval = checkpoint_interval
+        self.buffer_size = buffer_size
+        self._buffer = bytearray()
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._buffer += _RECORD_MAGIC
+        else:
+            with open(path, 'rb') as f:
+                if f.read(len(_RECORD_MAGIC)) != _RECORD_MAGIC:
+                    raise ValueError('Not a game record file: ' + path)
+
+        self._file = open(path, 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_game(self, game, actions):
+        '''append a game given its initial state and its actions'''
+
+        if game.rules is not self.rules:
+            raise ValueError('{!r} is not the {!r} of the record'.format(
+                game.rules, self.rules))
+
+        # replay from what a reader decodes, without the repetition history
+        # of game, so checkpoints match
+        game = decode(encode(game), game.__class__, game.rules)
+        size = game.size
+        buffer = self._buffer
+        buffer += _GAME
+        buffer += encode(game)
+
+        interval = self.checkpoint_interval
+        for start in range(0, len(actions), interval):
+            block = actions[start:start + interval]
+            buffer += _ACTIONS
+            buffer.append(len(block))
+            for action in block:
+                for position in action:
+                    buffer.append(_NONE if position is None else
+                                  position[0] * size + position[1])
+                game.apply(action)
+
+            buffer += _CHECKPOINT
+            buffer += encode(game)
+
+        buffer += _END
+
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self._file.write(self._buffer)
+        self._file.flush()
+        self._buffer = bytearray()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_games(path,
+               game_class=DalaGame,
+               verify=False,
+               chunk_size=1 << 16,
+               rules=None):
+    '''yield (initial game, actions) for every complete game in path
+
+    With verify, actions are replayed and compared with each checkpoint. A
+    game cut short by an interrupted writer is skipped. rules must be those
+    the file was written with.
+    '''
+
+    if rules is None:
+        rules = DalaGame.rules
+
+    with open(path, 'rb') as f:
+        if f.read(len(_RECORD_MAGIC)) != _RECORD_MAGIC:
+            raise ValueError('Not a game record file: ' + path)
+
+        data = b''
+        offset = 0
+        while True:
+            more = f.read(chunk_size)
+            data = data[offset:] + more
+            offset = 0
+
+            while True:
+                parsed = _parse_game(data, offset, game_class, verify, rules)
+                if parsed is None:
+                    break
+                offset, game, actions = parsed
+                yield game, actions
+
+            if not more:
+                break
+
+
+def _parse_game(data, offset, game_class, verify, rules):
+    '''parse one game at offset or return None if data ends before it does'''
+
+    state = state_size(rules)
+    if offset + 1 + state > len(data):
+        return None
+    if data[offset:offset + 1] != _GAME:
+        raise ValueError('Corrupted game record at byte {}'.format(offset))
+
+    game = decode(data[offset + 1:offset + 1 + state], game_class, rules)
+    replay = game.copy() if verify else None
+    offset += 1 + state
+
+    actions = []
+    while True:
+        if offset >= len(data):
+            return None
+
+        tag = data[offset:offset + 1]
+        if tag == _END:
+            return offset + 1, game, actions
+
+        elif tag == _ACTIONS:
+            if offset + 2 > len(data):
+                return None
+            count = data[offset + 1]
+            end = offset + 2 + 3 * count
+            if end > len(data):
+                return None
+
+            for i in range(offset + 2, end, 3):
+                action = Action(*(None if cell == _NONE else divmod(
+                    cell, rules.size) for cell in data[i:i + 3]))
+                actions.append(action)
+                if replay is not None:
+                    replay.apply(action)
+            offset = end
+
+        elif tag == _CHECKPOINT:
+            end = offset + 1 + state
+            if end > len(data):
+                return None
+            if replay is not None and encode(replay) != data[offset + 1:end]:
+                raise ValueError(
+                    'Checkpoint mismatch at byte {}'.format(offset))
+            offset = end
+
+        else:
+            raise ValueError('Corrupted game record at byte {}'.format(
+                offset))
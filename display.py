@@ -49,17 +49,20 @@ class Display(object):
         else:
             return None
 
-    def display_opening(self):
+    def display_opening(self, fade=True):
         title = Title(self.title)
-        title.draw(self.surface, clock=self.clock)
+        title.draw(self.surface, clock=self.clock, fade=fade)
+        self.board.invalidate()
 
     def draw_board(self, dala_game):
         self.board.update(dala_game)
-        self.board.draw(self.surface, (Display.board_x, Display.board_y))
+        return self.board.draw(self.surface,
+                               (Display.board_x, Display.board_y))
 
     def update(self, dala_game):
-        self.draw_board(dala_game)
-        pygame.display.update()
+        rects = self.draw_board(dala_game)
+        if rects:
+            pygame.display.update(rects)
 
 
 class RemainPieces(object):
@@ -87,27 +90,26 @@ class Title(object):
         self.title = font.render(title, True, Colors.game_title,
                                  Colors.game_background)
 
-    def draw(self, surface, clock, fps=40):
+    def draw(self, surface, clock, fps=40, fade=True):
         rect = self.title.get_rect()
         rect.center = surface.get_rect().center
 
-        # fade in
-        for i in range(0, 255, 20):
-            self.title.set_alpha(i)
-            surface.fill(Colors.game_background)
-            surface.blit(self.title, rect)
-            pygame.display.update()
-            clock.tick(fps)
+        if fade:
+            # fade in, hold for a second and fade out
+            steps = [(i, fps) for i in range(0, 255, 20)]
+            steps[-1] = (steps[-1][0], fps / 40)
+            steps += [(i, fps) for i in range(240, 20, -20)]
 
-        clock.tick(fps / 40)
+            for alpha, rate in steps:
+                self.title.set_alpha(alpha)
+                surface.fill(Colors.game_background)
+                surface.blit(self.title, rect)
+                pygame.display.update()
+                clock.tick(rate)
 
-        # fade out
-        for i in range(240, 20, -20):
-            self.title.set_alpha(i)
-            surface.fill(Colors.game_background)
-            surface.blit(self.title, rect)
-            pygame.display.update()
-            clock.tick(fps)
+                # any key or click skips the rest
+                if pygame.event.get((pygame.KEYUP, pygame.MOUSEBUTTONUP)):
+                    break
 
         surface.fill(Colors.game_background)
         pygame.display.update()
@@ -122,6 +124,10 @@ class Board(object):
 
     def __init__(self):
         self.surface = pygame.Surface((Board.size, Board.size)).convert()
+        self._grid = self._render_grid()
+        # the color drawn in each cell, None before the first update
+        self._drawn = None
+        self._dirty = []
         self.drop_candidate = None
         self.source_candidate = None
         self.destination_candidate = None
@@ -133,16 +139,38 @@ class Board(object):
         self.destination_candidate = None
         self.capture_candidate = None
 
+    def invalidate(self):
+        '''redraw the whole board on the next update'''
+        self._drawn = None
+
     def draw(self, surface, position):
-        surface.blit(self.surface, position)
+        '''blit the cells changed by the last update and return their rects'''
+
+        x, y = position
+        rects = []
+        for rect in self._dirty:
+            rects.append(surface.blit(self.surface, rect.move(x, y), rect))
+        self._dirty = []
+        return rects
 
     def update(self, dala_game):
-        board = dala_game._board
+        colors = self._cell_colors(dala_game)
 
-        self._draw_background()
-        self._draw_grid(board)
-        self._draw_pieces(board)
-        self._draw_candidates(dala_game)
+        full = self._drawn is None
+        if full:
+            self.surface.blit(self._grid, (0, 0))
+            self._drawn = [[None] * DalaGame.size
+                           for i in range(DalaGame.size)]
+            self._dirty = [self.surface.get_rect()]
+
+        for r in range(DalaGame.size):
+            for c in range(DalaGame.size):
+                color = colors[r][c]
+                if color != self._drawn[r][c]:
+                    self._drawn[r][c] = color
+                    rect = self._draw_cell(r, c, color)
+                    if not full:
+                        self._dirty.append(rect)
 
     def update_destination_candidate(self, game, position=None):
         self.destination_candidate = None
@@ -193,56 +221,72 @@ class Board(object):
         else:
             return None
 
-    def _draw_a_piece(self, position, color):
-        radius = Board.position_size // 3
-        r, c = position
-        x = Board.step_size * c + Board.wall_size + Board.position_size // 2
-        y = Board.step_size * r + Board.wall_size + Board.position_size // 2
-        pygame.draw.circle(self.surface, color, (x, y), radius)
+    def _cell_colors(self, dala_game):
+        board = dala_game.board()
+        colors = [[None if value == DalaGame.empty else
+                   Colors.piece_colors[value] for value in row]
+                  for row in board]
 
-    def _draw_candidates(self, dala_game):
         position = self.drop_candidate or self.destination_candidate
         if position is not None:
             r, c = position
-            if dala_game._board[r][c] == DalaGame.empty:
-                self._draw_a_piece(
-                    position,
-                    Colors.drop_candidate_colors[dala_game.whos_turn()])
+            if board[r][c] == DalaGame.empty:
+                colors[r][c] = Colors.drop_candidate_colors[
+                    dala_game.whos_turn()]
 
         position = self.capture_candidate
         if position is not None:
             r, c = position
-            if dala_game._board[r][c] == dala_game.next_turn():
-                self._draw_a_piece(
-                    position,
-                    Colors.capture_candidate_colors[dala_game.next_turn()])
+            if board[r][c] == dala_game.next_turn():
+                colors[r][c] = Colors.capture_candidate_colors[
+                    dala_game.next_turn()]
 
         position = self.source_candidate
         if position is not None:
             r, c = position
-            if dala_game._board[r][c] == dala_game.whos_turn():
-                self._draw_a_piece(
-                    position,
-                    Colors.source_candidate_colors[dala_game.whos_turn()])
+            if board[r][c] == dala_game.whos_turn():
+                colors[r][c] = Colors.source_candidate_colors[
+                    dala_game.whos_turn()]
 
-    def _draw_pieces(self, board):
-        for r in range(DalaGame.size):
-            for c in range(DalaGame.size):
-                if board[r][c] != DalaGame.empty:
-                    self._draw_a_piece(
-                        (r, c), Colors.piece_colors[board[r][c]])
+        return colors
 
-    def _draw_background(self):
-        self.surface.fill(Colors.board_background)
+    def _draw_cell(self, r, c, color):
+        rect = pygame.Rect(Board.step_size * c + Board.wall_size,
+                           Board.step_size * r + Board.wall_size,
+                           Board.position_size, Board.position_size)
 
-    def _draw_grid(self, board):
-        color = Colors.board_wall
+        self.surface.blit(self._grid, rect, rect)
+        if color is not None:
+            self.surface.blit(_piece_sprite(color), rect)
+        return rect
+
+    def _render_grid(self):
+        grid = pygame.Surface((Board.size, Board.size)).convert()
+        grid.fill(Colors.board_background)
 
-        pygame.draw.rect(self.surface, color, (0, 0, Board.size, Board.size),
+        color = Colors.board_wall
+        pygame.draw.rect(grid, color, (0, 0, Board.size, Board.size),
                          Board.wall_size)
 
         for x in range(Board.step_size, Board.size, Board.step_size):
-            pygame.draw.line(self.surface, color, (x, 0), (x, Board.size),
+            pygame.draw.line(grid, color, (x, 0), (x, Board.size),
                              Board.wall_size)
-            pygame.draw.line(self.surface, color, (0, x), (Board.size, x),
+            pygame.draw.line(grid, color, (0, x), (Board.size, x),
                              Board.wall_size)
+
+        return grid
+
+
+_sprites = {}
+
+
+def _piece_sprite(color):
+    '''a piece of color on a transparent cell, rendered once per color'''
+
+    sprite = _sprites.get(color)
+    if sprite is None:
+        size = Board.position_size
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+        pygame.draw.circle(sprite, color, (size // 2, size // 2), size // 3)
+        _sprites[color] = sprite
+    return sprite
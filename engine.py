@@ -0,0 +1,283 @@
+import time
+from collections import namedtuple
+
+import instrument
+from tablebase import LOSS, WIN
+
+
+class SearchResult(
+        namedtuple('SearchResult',
+                   ['action', 'score', 'depth', 'nodes', 'elapsed', 'pv'])):
+    @property
+    def nodes_per_second(self):
+        if self.elapsed <= 0:
+            return float(self.nodes)
+        return self.nodes / self.elapsed
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable(object):
+    '''fixed-size table indexed by the low bits of the Zobrist key
+
+    An entry is replaced when it is left over from an earlier search or when
+    the new result was searched at least as deep.
+    '''
+
+    exact, lower, upper = range(3)
+
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.generation = 0
+        self._entries = [None] * size
+
+    def clear(self):
+        self.generation = 0
+        self._entries = [None] * self.size
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key):
+        entry = self._entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def put(self, key, depth, score, flag, action):
+        index = key % self.size
+        entry = self._entries[index]
+        if (entry is None or entry[5] != self.generation or
+                entry[0] == key or depth >= entry[1]):
+            self._entries[index] = (key, depth, score, flag, action,
+                                    self.generation)
+
+
+class Engine(object):
+    '''iterative-deepening negamax with alpha-beta pruning
+
+    Every Action from DalaGame.legal_actions() is one decision, so a drop or
+    a move followed by each possible capture are searched as separate
+    children.
+    '''
+
+    win_score = 100000
+    piece_score = 100
+
+    def __init__(self, tt_size=1 << 16, tablebase=None, book=None):
+        self.table = TranspositionTable(tt_size)
+        self.tablebase = tablebase
+        self.book = book
+        self.nodes = 0
+        self._deadline = None
+        self._stopped = False
+        # draws scored so far; they depend on the path to a position, which
+        # its hash does not cover
+        self._draws = 0
+
+    def stop(self):
+        '''make the running search and any later one return their deepest
+        completed iteration, until resume()'''
+        self._stopped = True
+
+    def resume(self):
+        self._stopped = False
+
+    def search(self, game, max_depth=4, time_limit=None):
+        '''return the SearchResult of the deepest completed iteration'''
+
+        if self.book is not None:
+            for action, score in self.book.lookup(game):
+                if action in game.legal_actions():
+                    return SearchResult(action, score, 0, 0, 0.0, [action])
+
+        game = game.copy()
+        self.table.new_search()
+        self.nodes = 0
+
+        start = time.time()
+        self._deadline = None if time_limit is None else start + time_limit
+
+        result = None
+        for depth in range(1, max_depth + 1):
+            if self._stopped:
+                break
+            try:
+                score = self._negamax(game, depth, -self.win_score - 1,
+                                      self.win_score + 1, 0)
+            except SearchTimeout:
+                break
+
+            pv = self._principal_variation(game, depth)
+            result = SearchResult(pv[0] if pv else None, score, depth,
+                                  self.nodes, time.time() - start, pv)
+
+            if abs(score) >= self.win_score - depth:
+                break
+
+        if result is None:
+            actions = list(game.legal_actions())
+            result = SearchResult(actions[0] if actions else None, 0, 0,
+                                  self.nodes, time.time() - start,
+                                  actions[:1])
+
+        result = result._replace(nodes=self.nodes,
+                                 elapsed=time.time() - start)
+        if instrument.enabled:
+            instrument.add('engine.search', result.elapsed)
+            instrument.add('engine.nodes', count=self.nodes)
+        return result
+
+    def best_action(self, game, max_depth=4, time_limit=None):
+        return self.search(game, max_depth, time_limit).action
+
+    def evaluate(self, game):
+        '''static score from the point of view of the side to move'''
+
+        player = game.whos_turn()
+        opponent = game.next_turn()
+        return (game.lost(opponent) - game.lost(player)) * self.piece_score
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and (
+                self._stopped or self._deadline is not None and
+                time.time() > self._deadline):
+            raise SearchTimeout()
+
+        winner = game.winner()
+        if winner is not None:
+            if winner == game.whos_turn():
+                return self.win_score - ply
+            return -(self.win_score - ply)
+
+        # a repetition inside the search is scored as the draw that repeating
+        # it can force, which also cuts move cycles short
+        if game.draw() or ply > 0 and game.repetitions() > 1:
+            self._draws += 1
+            return 0
+
+        if self.tablebase is not None and ply > 0:
+            known = self.tablebase.probe(game)
+            if known is not None:
+                return self._tablebase_score(known, ply, game)
+
+        key = game.hash()
+        entry = self.table.get(key)
+        tt_action = None
+        if entry is not None:
+            tt_action = entry[4]
+            if entry[1] >= depth:
+                score = self._score_from_table(entry[2], ply)
+                flag = entry[3]
+                if flag == TranspositionTable.exact:
+                    return score
+                elif flag == TranspositionTable.lower and score >= beta:
+                    return score
+                elif flag == TranspositionTable.upper and score <= alpha:
+                    return score
+
+        if depth <= 0:
+            return self.evaluate(game)
+
+        actions = self._ordered_actions(game, tt_action)
+        if not actions:
+            # a side that cannot move loses
+            return -(self.win_score - ply)
+
+        original_alpha = alpha
+        draws = self._draws
+        best_score = -self.win_score - 1
+        best_action = None
+
+        for action in actions:
+            game.apply(action)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo()
+
+            if score > best_score:
+                best_score = score
+                best_action = action
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if self._draws != draws:
+            # keep the action for ordering, but never reuse the score
+            depth = -1
+
+        if best_score <= original_alpha:
+            flag = TranspositionTable.upper
+        elif best_score >= beta:
+            flag = TranspositionTable.lower
+        else:
+            flag = TranspositionTable.exact
+
+        self.table.put(key, depth, self._score_to_table(best_score, ply),
+                       flag, best_action)
+        return best_score
+
+    def _ordered_actions(self, game, tt_action):
+        actions = list(game.legal_actions())
+        actions.sort(key=lambda action: action.capture is None)
+
+        if tt_action is not None and tt_action in actions:
+            actions.remove(tt_action)
+            actions.insert(0, tt_action)
+
+        return actions
+
+    def _principal_variation(self, game, depth):
+        pv = []
+        seen = set()
+
+        while len(pv) < depth and game.hash() not in seen:
+            seen.add(game.hash())
+            entry = self.table.get(game.hash())
+            if entry is None or entry[4] is None:
+                break
+
+            action = entry[4]
+            if action not in game.legal_actions():
+                break
+
+            pv.append(action)
+            game.apply(action)
+
+        for _ in pv:
+            game.undo()
+
+        return pv
+
+    def _tablebase_score(self, known, ply, game):
+        result, distance = known
+        limit = game.no_capture_limit
+        if limit and distance > limit - game.quiet_moves():
+            # the no-capture rule draws before the line is played out
+            self._draws += 1
+            return 0
+
+        if result == WIN:
+            return self.win_score - ply - distance
+        elif result == LOSS:
+            return -(self.win_score - ply - distance)
+        return 0
+
+    def _score_to_table(self, score, ply):
+        if score >= self.win_score - 1000:
+            return score + ply
+        elif score <= -self.win_score + 1000:
+            return score - ply
+        return score
+
+    def _score_from_table(self, score, ply):
+        if score >= self.win_score - 1000:
+            return score - ply
+        elif score <= -self.win_score + 1000:
+            return score + ply
+        return score
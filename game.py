@@ -1,13 +1,52 @@
+import random
+from collections import namedtuple
+from enum import IntEnum
+
 from exceptions import *
 
+# source is None for drops; capture is None unless the action captures
+Action = namedtuple('Action', ['source', 'destination', 'capture'])
+
+
+class Status(IntEnum):
+    '''result of check_drop() and check_move(); only OK is false'''
+
+    OK = 0
+    NOT_YOUR_TURN = 1
+    OUT_OF_SCOPE = 2
+    ALREADY_OCCUPIED = 3
+    CENTRAL_NOT_OCCUPIED = 4
+    NO_PIECES_LEFT = 5
+    MUST_DROP_FIRST = 6
+    NO_PIECE_TO_MOVE = 7
+    SAME_PLACE = 8
+    TOO_FAR = 9
+    MUST_CAPTURE = 10
+    MUST_NOT_CAPTURE = 11
+    CAPTURE_OUT_OF_SCOPE = 12
+    NO_PIECE_TO_CAPTURE = 13
+
+    def exception(self, position=None):
+        '''build the exception the raising API uses for this status'''
+
+        exception_class, message = _STATUS_ERRORS[self]
+        return exception_class(message.format(*(position or ())))
+
 
 class DalaGame(object):
+    # the standard rules; a game given other Rules overrides them and the
+    # rules attribute, set below, on the instance
     size = 6
     num_of_pieces = 12
     lost_condition = num_of_pieces - 2
     initial_condition = num_of_pieces - 2
     empty = -1
 
+    # the move phase is drawn when a position occurs repetition_limit times
+    # or after no_capture_limit moves without a capture; 0 disables either
+    repetition_limit = 3
+    no_capture_limit = 100
+
     drop_mode, move_mode, end_mode = range(3)
 
     def __init__(self,
@@ -15,15 +54,19 @@ class DalaGame(object):
                  remains=None,
                  lost=None,
                  turn=None,
-                 winner=None):
-        if board is None:
-            board = [[DalaGame.empty] * DalaGame.size
-                     for _ in range(DalaGame.size)]
-        else:
-            board = [list(l) for l in board]
+                 winner=None,
+                 repetition_limit=None,
+                 no_capture_limit=None,
+                 rules=None):
+        if rules is not None and rules is not self.rules:
+            self.rules = rules
+            self.size = rules.size
+            self.num_of_pieces = rules.num_of_pieces
+            self.lost_condition = rules.lost_condition
+            self.initial_condition = rules.initial_condition
 
         if remains is None:
-            remains = [DalaGame.num_of_pieces, DalaGame.num_of_pieces]
+            remains = [self.num_of_pieces, self.num_of_pieces]
         else:
             remains = list(remains)
 
@@ -35,40 +78,92 @@ class DalaGame(object):
         if turn is None:
             turn = 0
 
-        self._board = board
+        self._init_board(board)
         self._remains = remains
         self._lost = lost
         self._turn = turn
         self._winner = winner
+        self._history = []
+        self._hash = self._compute_hash()
+        self._mobility = self._compute_mobility()
+
+        if repetition_limit is not None:
+            self.repetition_limit = repetition_limit
+        if no_capture_limit is not None:
+            self.no_capture_limit = no_capture_limit
+        # move-phase positions since the last drop or capture and the number
+        # of moves that led to them
+        self._seen = {}
+        self._quiet = 0
+        if self._in_move_phase() and turn != DalaGame.empty:
+            self._seen[self._hash] = 1
+
+    def _init_board(self, board):
+        if board is None:
+            board = [[DalaGame.empty] * self.size for _ in range(self.size)]
+        else:
+            board = [list(l) for l in board]
+
+        self._board = board
 
     def copy(self):
-        return DalaGame(board=self._board,
-                        remains=self._remains,
-                        lost=self._lost,
-                        turn=self._turn,
-                        winner=self._winner)
+        game = self.__class__(board=self._board,
+                              remains=self._remains,
+                              lost=self._lost,
+                              turn=self._turn,
+                              winner=self._winner,
+                              repetition_limit=self.repetition_limit,
+                              no_capture_limit=self.no_capture_limit,
+                              rules=self.rules)
+        game._seen = dict(self._seen)
+        game._quiet = self._quiet
+        return game
 
     def __eq__(self, other):
         if isinstance(other, DalaGame):
-            return (self._board == other._board and
+            return (self.rules is other.rules and self._same_board(other) and
                     self._remains == other._remains and
                     self._lost == other._lost and self._turn == other._turn)
 
         else:
             return False
 
+    def __hash__(self):
+        return self._hash
+
+    def hash(self):
+        '''64-bit Zobrist key of board, turn, remains and lost'''
+        return self._hash
+
+    def _compute_hash(self):
+        rules = self.rules
+        h = rules.turn_keys[self._turn]
+        for player in range(2):
+            h ^= rules.remains_keys[player][self._remains[player]]
+            h ^= rules.lost_keys[player][self._lost[player]]
+            for r, c in self._positions_of(player):
+                h ^= rules.piece_keys[player][r * self.size + c]
+        return h
+
+    def _same_board(self, other):
+        if type(other) is type(self):
+            return self._board == other._board
+        else:
+            return self.board() == other.board()
+
     def print_game(self):
         '''print game status for debugging'''
 
         num_to_symbol = {DalaGame.empty: ' ', 0: 'O', 1: 'X'}
 
         print('  = Dala Game =\n')
-        print('   ' + ' '.join(str(i) for i in range(DalaGame.size)) + ' ')
+        print('   ' + ' '.join(str(i) for i in range(self.size)) + ' ')
 
-        wall = '  *' + '*'.join('-' * DalaGame.size) + '*'
+        wall = '  *' + '*'.join('-' * self.size) + '*'
         print(wall)
-        for i in range(DalaGame.size):
-            status = '|'.join(num_to_symbol[x] for x in self._board[i])
+        board = self.board()
+        for i in range(self.size):
+            status = '|'.join(num_to_symbol[x] for x in board[i])
             print('{} |{}|'.format(i, status))
             print(wall)
 
@@ -96,7 +191,7 @@ class DalaGame(object):
         return [list(l) for l in self._board]
 
     def game_mode(self):
-        if self.winner() is not None:
+        if self._turn == DalaGame.empty or self.winner() is not None:
             return DalaGame.end_mode
         elif self._remains[self.whos_turn()] > 0:
             return DalaGame.drop_mode
@@ -108,218 +203,685 @@ class DalaGame(object):
             return self._winner
 
         for i in range(2):
-            if self._lost[i] >= DalaGame.lost_condition:
+            if self._lost[i] >= self.lost_condition:
                 return self._compute_next_turn(i)
+
+        turn = self._turn
+        if (turn != DalaGame.empty and self._remains[turn] == 0 and
+                self._mobility[turn] == 0):
+            return self._compute_next_turn(turn)
         return None
 
+    def draw(self):
+        '''whether the game ended without a winner'''
+        return self._turn == DalaGame.empty and self.winner() is None
+
+    def repetitions(self):
+        '''times the current move-phase position has occurred'''
+        return self._seen.get(self._hash, 0)
+
+    def quiet_moves(self):
+        '''moves played since the last drop or capture'''
+        return self._quiet
+
+    def mobility(self, player):
+        '''number of (piece, empty neighbour) pairs of player'''
+        return self._mobility[player]
+
     def drop(self, player, position, capture=None):
-        self._check_turn(player)
+        status = self.check_drop(player, position, capture)
+        if status:
+            if status in (Status.CAPTURE_OUT_OF_SCOPE,
+                          Status.NO_PIECE_TO_CAPTURE):
+                position = capture
+            raise status.exception(position)
 
-        initial_condition = self._remains[player] > DalaGame.initial_condition
-        self._check_position(position, initial_condition=initial_condition)
+        self._apply_checked(Action(None, position, capture))
+
+    def move(self, player, source, destination, capture=None):
+        status = self.check_move(player, source, destination, capture)
+        if status:
+            if status in (Status.CAPTURE_OUT_OF_SCOPE,
+                          Status.NO_PIECE_TO_CAPTURE):
+                position = capture
+            elif (status == Status.NO_PIECE_TO_MOVE or
+                  status == Status.OUT_OF_SCOPE and
+                  not self._inside(source)):
+                position = source
+            else:
+                position = destination
+            raise status.exception(position)
+
+        self._apply_checked(Action(source, destination, capture))
+
+    def try_drop(self, player, position, capture=None):
+        '''drop only if legal and return the Status, never raising'''
+
+        status = self.check_drop(player, position, capture)
+        if not status:
+            self.apply(Action(None, position, capture))
+        return status
+
+    def try_move(self, player, source, destination, capture=None):
+        '''move only if legal and return the Status, never raising'''
+
+        status = self.check_move(player, source, destination, capture)
+        if not status:
+            self.apply(Action(source, destination, capture))
+        return status
+
+    def check_drop(self, player, position, capture=None):
+        '''return the Status of a drop without playing it'''
+
+        if player != self._turn or player not in (0, 1):
+            return Status.NOT_YOUR_TURN
+
+        status = self._check_position(position)
+        if status:
+            return status
+
+        if (self._remains[player] > self.initial_condition and
+                not self.is_central_position(position)):
+            return Status.CENTRAL_NOT_OCCUPIED
 
         if self._remains[player] <= 0:
-            raise IllegalMoveException('No pieces left')
+            return Status.NO_PIECES_LEFT
 
         r, c = position
 
-        self._board[r][c] = player
-        original_remain = self._remains[player]
-        self._remains[player] = original_remain - 1
-
+        self._set(r, c, player)
         captured = self._is_drop_capture(player, position)
+        self._set(r, c, DalaGame.empty)
 
-        try:
-            self._check_capture(player, captured, capture)
+        return self._check_capture(player, captured, capture)
 
-            if captured:
-                self._capture(player, capture)
+    def check_move(self, player, source, destination, capture=None):
+        '''return the Status of a move without playing it'''
 
-        except GameOverException:
-            self._next_turn(DalaGame.empty)
-            raise
-
-        except:
-            self._board[r][c] = DalaGame.empty
-            self._remains[player] = original_remain
-            raise
+        if player != self._turn or player not in (0, 1):
+            return Status.NOT_YOUR_TURN
 
-        self._next_turn()
+        if not self._inside(source):
+            return Status.OUT_OF_SCOPE
 
-    def move(self, player, source, destination, capture=None):
-        self._check_turn(player)
-        self._check_position(source, check_occupied=False)
-        self._check_position(destination)
-        self._check_movable(player, source, destination)
+        status = (self._check_position(destination) or
+                  self._check_movable(player, source, destination))
+        if status:
+            return status
 
         if self._remains[player] > 0:
-            raise IllegalMoveException('Must drop first')
-
-        self._board[source[0]][source[1]] = DalaGame.empty
-        self._board[destination[0]][destination[1]] = player
+            return Status.MUST_DROP_FIRST
 
+        self._set(source[0], source[1], DalaGame.empty)
+        self._set(destination[0], destination[1], player)
         captured = self._is_move_capture(player, source, destination)
+        self._set(destination[0], destination[1], DalaGame.empty)
+        self._set(source[0], source[1], player)
+
+        return self._check_capture(player, captured, capture)
+
+    def apply(self, action):
+        '''play an action from legal_actions() in place
 
-        try:
-            self._check_capture(player, captured, capture)
+        The action is not validated and no exception is raised when the game
+        ends; every call can be reverted with undo().
+        '''
 
-            if captured:
-                self._capture(player, capture)
+        source, destination, capture = action
+        player = self._turn
+        entry = [action, player, self._winner, self._quiet, self._seen, None]
+        self._history.append(entry)
 
-        except GameOverException:
+        if source is None:
+            remains = self._remains[player]
+            self._remains[player] = remains - 1
+            keys = self.rules.remains_keys[player]
+            self._hash ^= keys[remains] ^ keys[remains - 1]
+        else:
+            self._remove(source[0], source[1], player)
+        self._place(destination[0], destination[1], player)
+
+        if capture is not None and self._capture(player, capture):
             self._next_turn(DalaGame.empty)
-            raise
+        else:
+            self._next_turn()
+
+        if self._turn != DalaGame.empty and self._in_move_phase():
+            entry[5] = self._record(source is None or capture is not None)
+
+    def undo(self):
+        '''revert the last drop, move or apply'''
+
+        action, player, winner, quiet, seen, key = self._history.pop()
+        source, destination, capture = action
+        if key is not None:
+            count = self._seen[key] - 1
+            if count:
+                self._seen[key] = count
+            else:
+                del self._seen[key]
+        self._seen = seen
+        self._quiet = quiet
+
+        rules = self.rules
+        self._hash ^= rules.turn_keys[self._turn] ^ rules.turn_keys[player]
+
+        if capture is not None:
+            opponent = self._compute_next_turn(player)
+            lost = self._lost[opponent]
+            self._lost[opponent] = lost - 1
+            keys = rules.lost_keys[opponent]
+            self._hash ^= keys[lost] ^ keys[lost - 1]
+            self._place(capture[0], capture[1], opponent)
+
+        self._remove(destination[0], destination[1], player)
+        if source is None:
+            remains = self._remains[player]
+            self._remains[player] = remains + 1
+            keys = rules.remains_keys[player]
+            self._hash ^= keys[remains] ^ keys[remains + 1]
+        else:
+            self._place(source[0], source[1], player)
+
+        self._turn = player
+        self._winner = winner
+
+    def _apply_checked(self, action):
+        self.apply(action)
+
+        if self._turn == DalaGame.empty:
+            if self.draw():
+                raise GameOverException('draw!')
+            raise GameOverException('player {} wins!'.format(self.winner()))
+
+    def legal_actions(self):
+        '''generate every legal action for the side to move without raising'''
 
-        except:
-            self._board[source[0]][source[1]] = player
-            self._board[destination[0]][destination[1]] = DalaGame.empty
-            raise
+        mode = self.game_mode()
+        if mode == DalaGame.end_mode:
+            return
 
-        self._next_turn()
+        player = self._turn
+        opponent = self._compute_next_turn(player)
+        captures = None
+
+        if mode == DalaGame.drop_mode:
+            initial_condition = self._remains[
+                player] > self.initial_condition
+
+            for position in self._positions_of(DalaGame.empty):
+                if initial_condition and not self.is_central_position(
+                        position):
+                    continue
+
+                r, c = position
+                self._set(r, c, player)
+                captured = self._is_drop_capture(player, position)
+                self._set(r, c, DalaGame.empty)
+
+                if captured:
+                    if captures is None:
+                        captures = self._positions_of(opponent)
+                    for capture in captures:
+                        yield Action(None, position, capture)
+                else:
+                    yield Action(None, position, None)
+
+        else:
+            for source in self._positions_of(player):
+                r, c = source
+                for destination in self._neighbours(source):
+                    dr, dc = destination
+                    if self._get(dr, dc) != DalaGame.empty:
+                        continue
+
+                    self._set(r, c, DalaGame.empty)
+                    self._set(dr, dc, player)
+                    captured = self._is_move_capture(player, source,
+                                                     destination)
+                    self._set(dr, dc, DalaGame.empty)
+                    self._set(r, c, player)
+
+                    if captured:
+                        if captures is None:
+                            captures = self._positions_of(opponent)
+                        for capture in captures:
+                            yield Action(source, destination, capture)
+                    else:
+                        yield Action(source, destination, None)
+
+    def canonical(self):
+        '''return the smallest of the 8 symmetric games and its Transform
+
+        The Transform maps positions and actions of this game onto the
+        returned one; its inverse maps them back.
+        '''
+
+        cells = [cell for row in self.board() for cell in row]
+        best = None
+        best_transform = None
+        for transform in self.rules.transforms:
+            key = [cells[i] for i in transform._backward]
+            if best is None or key < best:
+                best = key
+                best_transform = transform
+
+        size = self.size
+        board = [best[r * size:(r + 1) * size] for r in range(size)]
+        game = self.__class__(board=board,
+                              remains=self._remains,
+                              lost=self._lost,
+                              turn=self._turn,
+                              winner=self._winner,
+                              repetition_limit=self.repetition_limit,
+                              no_capture_limit=self.no_capture_limit,
+                              rules=self.rules)
+        return game, best_transform
 
     def is_central_position(self, position):
-        upper = DalaGame.size // 2
+        upper = self.size // 2
         lower = upper - 1
         r, c = position
         return lower <= r <= upper and lower <= c <= upper
 
     def _capture(self, player, capture):
-        self._board[capture[0]][capture[1]] = DalaGame.empty
+        '''remove the captured piece and tell whether the game is over'''
 
         next_turn = self._compute_next_turn(player)
-        self._lost[next_turn] += 1
+        self._remove(capture[0], capture[1], next_turn)
 
-        if self._lost[next_turn] >= DalaGame.lost_condition:
-            raise GameOverException('player {} wins!'.format(player))
+        lost = self._lost[next_turn] + 1
+        self._lost[next_turn] = lost
+        keys = self.rules.lost_keys[next_turn]
+        self._hash ^= keys[lost - 1] ^ keys[lost]
+
+        return lost >= self.lost_condition
 
     def _next_turn(self, next_turn=None):
         if next_turn is None:
-            self._turn = self._compute_next_turn(self._turn)
-        else:
-            self._turn = next_turn
+            next_turn = self._compute_next_turn(self._turn)
 
-        if self.game_mode == DalaGame.move_mode:
-            self._check_immovable()
+        if (next_turn != DalaGame.empty and self._remains[next_turn] == 0 and
+                self._mobility[next_turn] == 0):
+            # a side that cannot move loses
+            self._winner = self._compute_next_turn(next_turn)
+            next_turn = DalaGame.empty
+
+        keys = self.rules.turn_keys
+        self._hash ^= keys[self._turn] ^ keys[next_turn]
+        self._turn = next_turn
 
         return self._turn
 
-    def _is_move_capture(self, player, source, destination):
-        if self._is_drop_capture(player, destination):
-            return True
+    def _in_move_phase(self):
+        return self._remains[0] == 0 and self._remains[1] == 0
 
-        r, c = source
+    def _record(self, irreversible):
+        '''count the new move-phase position and end the game on a draw
 
-        row = self._board[r]
-        col = [self._board[i][c] for i in range(DalaGame.size)]
+        Return the recorded hash for undo().
+        '''
 
-        def check_capture(xs, i):
-            '''check if there are three connected pieces'''
-            left, right = self._compute_left_right(player, xs, i)
-
-            return left == 3 or right == 3
+        if irreversible:
+            # earlier positions cannot occur again
+            self._seen = {}
+            self._quiet = 0
+        else:
+            self._quiet += 1
 
-        return check_capture(row, c) or check_capture(col, r)
+        key = self._hash
+        count = self._seen.get(key, 0) + 1
+        self._seen[key] = count
 
-    def _is_drop_capture(self, player, position):
-        r, c = position
+        if (0 < self.repetition_limit <= count or
+                0 < self.no_capture_limit <= self._quiet):
+            self._next_turn(DalaGame.empty)
+        return key
+
+    def _place(self, r, c, player):
+        '''put a piece on an empty cell, updating hash and mobility'''
+
+        rules = self.rules
+        cell = r * self.size + c
+        mobility = self._mobility
+        for nr, nc in rules.neighbours[cell]:
+            value = self._get(nr, nc)
+            if value == DalaGame.empty:
+                mobility[player] += 1
+            else:
+                mobility[value] -= 1
 
-        row = self._board[r]
-        col = [self._board[i][c] for i in range(DalaGame.size)]
+        self._set(r, c, player)
+        self._hash ^= rules.piece_keys[player][cell]
 
-        def check_capture(xs, i):
-            '''check if there are three connected pieces'''
-            left, right = self._compute_left_right(player, xs, i)
+    def _remove(self, r, c, player):
+        '''take a piece of player off the board, updating hash and mobility'''
 
-            return left + right + 1 == 3
+        rules = self.rules
+        cell = r * self.size + c
+        self._set(r, c, DalaGame.empty)
+        self._hash ^= rules.piece_keys[player][cell]
 
-        return check_capture(row, c) or check_capture(col, r)
+        mobility = self._mobility
+        for nr, nc in rules.neighbours[cell]:
+            value = self._get(nr, nc)
+            if value == DalaGame.empty:
+                mobility[player] -= 1
+            else:
+                mobility[value] += 1
+
+    def _compute_mobility(self):
+        neighbours = self.rules.neighbours
+        mobility = [0, 0]
+        for player in range(2):
+            for r, c in self._positions_of(player):
+                for nr, nc in neighbours[r * self.size + c]:
+                    if self._get(nr, nc) == DalaGame.empty:
+                        mobility[player] += 1
+        return mobility
 
-    def _check_immovable(self, player=None):
-        if player is None:
-            player = self.whos_turn()
+    def _is_move_capture(self, player, source, destination):
+        if self._is_drop_capture(player, destination):
+            return True
 
-        for r in range(DalaGame.size):
-            for c in range(DalaGame.size):
-                if self._board[r][c] == player and self._check_movable((r, c)):
-                    return
+        return self._is_line(
+            player, self.rules.beside_lines[source[0] * self.size + source[1]])
 
-        winner = self._compute_next_turn(player)
-        self._winner = winner
-        raise GameOverException('player {} wins!'.format(winner))
+    def _is_drop_capture(self, player, position):
+        return self._is_line(
+            player,
+            self.rules.through_lines[position[0] * self.size + position[1]])
+
+    def _is_line(self, player, lines):
+        '''check if any of lines is exactly three connected pieces'''
+
+        board = self._board
+        for segment, fence in lines:
+            for r, c in segment:
+                if board[r][c] != player:
+                    break
+            else:
+                for r, c in fence:
+                    if board[r][c] == player:
+                        break
+                else:
+                    return True
 
-    def _check_turn(self, player):
-        if player != self._turn or player not in (0, 1):
-            raise NotYourTurnException('Not your turn')
+        return False
 
     def _check_capture(self, player, captured, position):
         if captured:
             if position is None:
-                raise MustCaptureException('Must capture')
-            else:
-                r, c = position
-
-                try:
-                    self._check_position(position, check_occupied=False)
-
-                except IllegalPositionException:
-                    raise IllegalCapturePositionException(
-                        'Illegal position: ({}, {})'.format(r, c))
-
-                if self._board[r][c] != self._compute_next_turn(player):
-                    raise IllegalCapturePositionException(
-                        'Opponent\'s piece doesn\'t exist in capture position: ({}, {})'.format(
-                            r, c))
+                return Status.MUST_CAPTURE
+            if not self._inside(position):
+                return Status.CAPTURE_OUT_OF_SCOPE
+            if self._get(position[0], position[1]) != self._compute_next_turn(
+                    player):
+                return Status.NO_PIECE_TO_CAPTURE
 
         elif position is not None:
-            raise MustNotCaptureException('Must not capture')
+            return Status.MUST_NOT_CAPTURE
 
-    def _check_position(self,
-                        position,
-                        check_occupied=True,
-                        initial_condition=False):
-        r, c = position
-        if r >= DalaGame.size or r < 0 or c >= DalaGame.size or c < 0:
-            raise IllegalPositionException(
-                'Position out of scope: ({}, {})'.format(r, c))
+        return Status.OK
+
+    def _check_position(self, position):
+        if not self._inside(position):
+            return Status.OUT_OF_SCOPE
 
-        if check_occupied and self._board[r][c] != -1:
-            raise AlreadyOccupiedException(
-                'Position aleary occupied: ({}, {})'.format(r, c))
+        if self._get(position[0], position[1]) != DalaGame.empty:
+            return Status.ALREADY_OCCUPIED
 
-        if initial_condition and not self.is_central_position(position):
-            raise CentralNotOccupiedException(
-                'Central positions must be occupied first')
+        return Status.OK
 
     def _check_movable(self, player, source, destination):
         r, c = source
         dr, dc = destination
 
-        if self._board[r][c] != player:
-            raise IllegalMovementException(
-                'Not pieces to move at ({}, {})'.format(r, c))
+        if self._get(r, c) != player:
+            return Status.NO_PIECE_TO_MOVE
 
         if source == destination:
-            raise IllegalMovementException('Could not stay at the same place')
+            return Status.SAME_PLACE
 
         if abs(r - dr) + abs(c - dc) != 1:
-            raise IllegalMovementException('Could not move that far')
+            return Status.TOO_FAR
 
-    def _compute_left_right(self, player, xs, i):
-        '''check if there are connected pieces'''
+        return Status.OK
 
-        left = right = 0
-        for j in range(i + 1, DalaGame.size):
-            if xs[j] == player:
-                right += 1
-            else:
-                break
+    def _inside(self, position):
+        r, c = position
+        return 0 <= r < self.size and 0 <= c < self.size
 
-        for j in range(i - 1, -1, -1):
-            if xs[j] == player:
-                left += 1
-            else:
-                break
-        return left, right
+    def _positions_of(self, value):
+        return [(r, c)
+                for r in range(self.size) for c in range(self.size)
+                if self._board[r][c] == value]
+
+    def _neighbours(self, position):
+        return self.rules.neighbours[position[0] * self.size + position[1]]
+
+    def _get(self, r, c):
+        return self._board[r][c]
+
+    def _set(self, r, c, value):
+        self._board[r][c] = value
 
     def _compute_next_turn(self, n):
         return (n + 1) % 2
+
+
+_STATUS_ERRORS = {
+    Status.NOT_YOUR_TURN: (NotYourTurnException, 'Not your turn'),
+    Status.OUT_OF_SCOPE:
+    (IllegalPositionException, 'Position out of scope: ({}, {})'),
+    Status.ALREADY_OCCUPIED:
+    (AlreadyOccupiedException, 'Position aleary occupied: ({}, {})'),
+    Status.CENTRAL_NOT_OCCUPIED: (CentralNotOccupiedException,
+                                  'Central positions must be occupied first'),
+    Status.NO_PIECES_LEFT: (IllegalMoveException, 'No pieces left'),
+    Status.MUST_DROP_FIRST: (IllegalMoveException, 'Must drop first'),
+    Status.NO_PIECE_TO_MOVE:
+    (IllegalMovementException, 'Not pieces to move at ({}, {})'),
+    Status.SAME_PLACE:
+    (IllegalMovementException, 'Could not stay at the same place'),
+    Status.TOO_FAR: (IllegalMovementException, 'Could not move that far'),
+    Status.MUST_CAPTURE: (MustCaptureException, 'Must capture'),
+    Status.MUST_NOT_CAPTURE: (MustNotCaptureException, 'Must not capture'),
+    Status.CAPTURE_OUT_OF_SCOPE:
+    (IllegalCapturePositionException, 'Illegal position: ({}, {})'),
+    Status.NO_PIECE_TO_CAPTURE: (
+        IllegalCapturePositionException,
+        'Opponent\'s piece doesn\'t exist in capture position: ({}, {})'),
+}
+
+
+def line_tables(size):
+    '''build capture lines and neighbours for every cell of the board
+
+    Tables are indexed by r * size + c and hold (row, column) pairs. Each
+    line is a (segment, fence) pair: the player forms a capture line when
+    owning every cell of the segment and no cell of the fence, i.e. the run
+    is exactly three pieces long. The first table has the segments through
+    a cell, the second the segments next to it, for the cell a piece moved
+    away from.
+    '''
+
+    def in_board(r, c):
+        return 0 <= r < size and 0 <= c < size
+
+    through = []
+    beside = []
+    neighbours = []
+
+    for r in range(size):
+        for c in range(size):
+            lines = []
+            for dr, dc in ((0, 1), (1, 0)):
+                for start in range(-2, 1):
+                    segment = tuple((r + dr * k, c + dc * k)
+                                    for k in range(start, start + 3))
+                    if not all(in_board(*cell) for cell in segment):
+                        continue
+
+                    fence = tuple(
+                        (r + dr * k, c + dc * k)
+                        for k in (start - 1, start + 3)
+                        if in_board(r + dr * k, c + dc * k))
+                    lines.append((segment, fence))
+            through.append(tuple(lines))
+
+            lines = []
+            for dr, dc in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+                segment = tuple((r + dr * k, c + dc * k) for k in range(1, 4))
+                if not all(in_board(*cell) for cell in segment):
+                    continue
+
+                far = (r + dr * 4, c + dc * 4)
+                fence = (far, ) if in_board(*far) else ()
+                lines.append((segment, fence))
+            beside.append(tuple(lines))
+
+            neighbours.append(
+                tuple((nr, nc)
+                      for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1),
+                                     (r, c + 1)) if in_board(nr, nc)))
+
+    return tuple(through), tuple(beside), tuple(neighbours)
+
+
+class Transform(object):
+    '''one of the 8 rotations and reflections of the board'''
+
+    def __init__(self, transpose, flip_rows, flip_cols, size=DalaGame.size):
+        self.size = size
+        self.transpose = transpose
+        self.flip_rows = flip_rows
+        self.flip_cols = flip_cols
+
+        forward = []
+        for r in range(size):
+            for c in range(size):
+                nr, nc = (c, r) if transpose else (r, c)
+                if flip_rows:
+                    nr = size - 1 - nr
+                if flip_cols:
+                    nc = size - 1 - nc
+                forward.append(nr * size + nc)
+
+        backward = [0] * len(forward)
+        for cell, target in enumerate(forward):
+            backward[target] = cell
+
+        self._forward = tuple(forward)
+        self._backward = tuple(backward)
+
+    def __repr__(self):
+        return 'Transform({}, {}, {})'.format(self.transpose, self.flip_rows,
+                                              self.flip_cols)
+
+    def position(self, position):
+        return self._map(self._forward, position)
+
+    def inverse_position(self, position):
+        return self._map(self._backward, position)
+
+    def action(self, action):
+        return Action(*(self.position(p) for p in action))
+
+    def inverse_action(self, action):
+        return Action(*(self.inverse_position(p) for p in action))
+
+    def _map(self, table, position):
+        if position is None:
+            return None
+
+        r, c = position
+        return divmod(table[r * self.size + c], self.size)
+
+
+def _zobrist_keys(size, num_of_pieces):
+    rng = random.Random(0xDA1A)
+
+    def keys(n):
+        return [rng.getrandbits(64) for _ in range(n)]
+
+    pieces = [keys(size * size) for _ in range(2)]
+    remains = [keys(num_of_pieces + 1) for _ in range(2)]
+    lost = [keys(num_of_pieces + 1) for _ in range(2)]
+    turn = dict(zip((0, 1, DalaGame.empty), keys(3)))
+
+    return pieces, remains, lost, turn
+
+
+class Rules(object):
+    '''board size and piece counts of a Dala variant, with its tables
+
+    Use Rules.get(), which builds the line, neighbour, hash and symmetry
+    tables of a configuration once and returns the same Rules after that,
+    so games of any mix of variants can share them.
+    '''
+
+    _cache = {}
+
+    def __init__(self, size, num_of_pieces, lost_condition, initial_condition):
+        self.size = size
+        self.num_of_pieces = num_of_pieces
+        self.lost_condition = lost_condition
+        self.initial_condition = initial_condition
+
+        self.through_lines, self.beside_lines, self.neighbours = line_tables(
+            size)
+        (self.piece_keys, self.remains_keys, self.lost_keys,
+         self.turn_keys) = _zobrist_keys(size, num_of_pieces)
+        self.transforms = tuple(
+            Transform(transpose, flip_rows, flip_cols, size)
+            for transpose in (False, True) for flip_rows in (False, True)
+            for flip_cols in (False, True))
+
+    @classmethod
+    def get(cls,
+            size=DalaGame.size,
+            num_of_pieces=DalaGame.num_of_pieces,
+            lost_condition=None,
+            initial_condition=None):
+        '''the shared Rules of a configuration
+
+        Both conditions default to num_of_pieces - 2 like the standard game.
+        '''
+
+        if lost_condition is None:
+            lost_condition = num_of_pieces - 2
+        if initial_condition is None:
+            initial_condition = num_of_pieces - 2
+
+        key = (size, num_of_pieces, lost_condition, initial_condition)
+        rules = cls._cache.get(key)
+        if rules is None:
+            if size < 3 or not 0 < 2 * num_of_pieces < size * size:
+                raise ValueError(
+                    '{} pieces a side do not fit a {}x{} board'.format(
+                        num_of_pieces, size, size))
+            if not 0 < lost_condition <= num_of_pieces:
+                raise ValueError('lost_condition must be within 1 and ' +
+                                 str(num_of_pieces))
+            # the central 2x2 cells take the first drops of both sides
+            if not 0 <= num_of_pieces - initial_condition <= 2:
+                raise ValueError('initial_condition must be within {} and {}'
+                                 .format(num_of_pieces - 2, num_of_pieces))
+
+            rules = cls._cache[key] = cls(*key)
+        return rules
+
+    def __reduce__(self):
+        return (Rules.get, (self.size, self.num_of_pieces, self.lost_condition,
+                            self.initial_condition))
+
+    def __repr__(self):
+        return ('Rules(size={}, num_of_pieces={}, lost_condition={}, '
+                'initial_condition={})'.format(self.size, self.num_of_pieces,
+                                               self.lost_condition,
+                                               self.initial_condition))
+
+
+DalaGame.rules = Rules.get()
+TRANSFORMS = DalaGame.rules.transforms
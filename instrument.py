@@ -0,0 +1,157 @@
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from exceptions import DalaException
+from game import DalaGame
+
+# DalaGame methods timed while instrumentation is enabled; _next_turn is
+# where immobility is checked
+GAME_METHODS = ('drop', 'move', 'apply', 'undo', 'copy', 'check_drop',
+                'check_move', '_is_drop_capture', '_is_move_capture',
+                '_capture', '_next_turn')
+
+# callers feeding the registry check this first, so a disabled layer costs
+# one attribute lookup
+enabled = False
+
+
+class Registry(object):
+    '''call counts and total seconds by name, plus gauges'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._gauges = {}
+
+    def add(self, name, seconds=0.0, count=1):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                self._stats[name] = [count, seconds]
+            else:
+                stats[0] += count
+                stats[1] += seconds
+
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        '''return {name: (count, seconds)} and {name: gauge value}'''
+
+        with self._lock:
+            return ({name: tuple(stats)
+                     for name, stats in self._stats.items()},
+                    dict(self._gauges))
+
+    def prometheus(self, prefix='dala'):
+        '''the snapshot in the Prometheus text exposition format'''
+
+        stats, gauges = self.snapshot()
+        lines = []
+
+        for metric, column in (('count', 0), ('seconds', 1)):
+            lines.append('# TYPE {}_{}_total counter'.format(prefix, metric))
+            for name in sorted(stats):
+                lines.append('{}_{}_total{{name="{}"}} {}'.format(
+                    prefix, metric, name, stats[name][column]))
+
+        if gauges:
+            lines.append('# TYPE {}_gauge gauge'.format(prefix))
+            for name in sorted(gauges):
+                lines.append('{}_gauge{{name="{}"}} {}'.format(
+                    prefix, name, gauges[name]))
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+_active = contextvars.ContextVar('registries', default=(REGISTRY, ))
+_originals = {}
+
+
+def add(name, seconds=0.0, count=1):
+    '''record into the global registry and every enclosing scope()'''
+    for registry in _active.get():
+        registry.add(name, seconds, count)
+
+
+def gauge(name, value):
+    for registry in _active.get():
+        registry.gauge(name, value)
+
+
+@contextlib.contextmanager
+def scope():
+    '''yield a Registry of what is recorded inside the with block
+
+    Scopes live in a context variable, so they follow the asyncio tasks
+    started inside them but not new threads: work handed to another thread
+    only reaches the global registry. One search or one session can be
+    measured while others run.
+    '''
+
+    registry = Registry()
+    token = _active.set(_active.get() + (registry, ))
+    try:
+        yield registry
+    finally:
+        _active.reset(token)
+
+
+def enable():
+    '''start timing GAME_METHODS on DalaGame and its subclasses'''
+
+    global enabled
+    if enabled:
+        return
+    enabled = True
+
+    for cls in _game_classes():
+        for name in GAME_METHODS:
+            function = cls.__dict__.get(name)
+            if function is not None:
+                _originals[cls, name] = function
+                setattr(cls, name, _timed('game.' + name, function))
+
+
+def disable():
+    '''put the original methods back'''
+
+    global enabled
+    enabled = False
+
+    for (cls, name), function in _originals.items():
+        setattr(cls, name, function)
+    _originals.clear()
+
+
+def _game_classes():
+    classes = [DalaGame]
+    for cls in classes:
+        classes.extend(cls.__subclasses__())
+    return classes
+
+
+def _timed(name, function):
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except DalaException as e:
+            add('raise.' + type(e).__name__)
+            raise
+        finally:
+            add(name, time.perf_counter() - start)
+
+    return timed
@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from server import game_from_state
+
+
+class LoadTestResult(object):
+    def __init__(self, latencies, errors, games, elapsed):
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.games = games
+        self.elapsed = elapsed
+
+    @property
+    def requests_per_second(self):
+        if self.elapsed <= 0:
+            return float(len(self.latencies))
+        return len(self.latencies) / self.elapsed
+
+    def percentile(self, p):
+        '''latency in seconds below which p percent of the requests took'''
+
+        if not self.latencies:
+            return 0.0
+        index = min(len(self.latencies) - 1,
+                    int(p / 100.0 * len(self.latencies)))
+        return self.latencies[index]
+
+    def report(self):
+        lines = [
+            '{} games, {} requests, {} errors in {:.2f}s ({:.0f} req/s)'.
+            format(self.games, len(self.latencies), self.errors,
+                   self.elapsed, self.requests_per_second)
+        ]
+        for p in (50, 90, 99, 99.9, 100):
+            lines.append('p{:<5} {:8.3f} ms'.format(p,
+                                                   self.percentile(p) * 1000))
+        return '\n'.join(lines)
+
+
+async def play_games(reader, writer, games, rng, latencies, limit=300):
+    '''play solo games with random legal actions, timing every request
+
+    Return the number of error replies.
+    '''
+
+    errors = 0
+
+    async def request(message):
+        start = time.perf_counter()
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        return reply
+
+    for _ in range(games):
+        reply = await request({'op': 'join', 'solo': True})
+        for _ in range(limit):
+            if not reply['ok']:
+                errors += 1
+                break
+
+            actions = list(game_from_state(reply['state']).legal_actions())
+            if not actions:
+                break
+
+            source, destination, capture = rng.choice(actions)
+            if source is None:
+                message = {'op': 'drop', 'position': destination}
+            else:
+                message = {
+                    'op': 'move',
+                    'source': source,
+                    'destination': destination
+                }
+            message['capture'] = capture
+            reply = await request(message)
+
+        await request({'op': 'leave'})
+
+    writer.close()
+    return errors
+
+
+async def run(host='127.0.0.1', port=8765, path=None, clients=100, games=1,
+              seed=0):
+    '''drive the server with clients concurrent connections'''
+
+    rng = random.Random(seed)
+    latencies = []
+    connections = [await _open(host, port, path) for _ in range(clients)]
+
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(play_games(
+        reader, writer, games, random.Random(rng.random()), latencies)
+                                    for reader, writer in connections))
+    elapsed = time.perf_counter() - start
+
+    return LoadTestResult(latencies, sum(errors), clients * games, elapsed)
+
+
+async def _open(host, port, path):
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test a Dala server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='connect to a Unix socket instead')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = asyncio.run(
+        run(args.host, args.port, args.unix, args.clients, args.games,
+            args.seed))
+    print(result.report())
@@ -1,11 +1,22 @@
 import argparse
+import queue
+import threading
 import time
+from collections import deque
 
-import pygame
-
-from display import Display
 from exceptions import *
-from game import DalaGame
+from game import Action, DalaGame, Status
+
+# set by _load_pygame() so that headless games never load pygame or SDL
+pygame = None
+AI_EVENT = None
+
+
+def _load_pygame():
+    global pygame, AI_EVENT
+    if pygame is None:
+        import pygame
+        AI_EVENT = pygame.USEREVENT + 1
 
 
 class MouseButtons(object):
@@ -22,163 +33,284 @@ class RestartException(Exception):
     pass
 
 
+class AIWorker(object):
+    '''run the searches of a player on a background thread
+
+    think() posts the chosen action as an AI_EVENT tagged with the number
+    it returned; a later think(), ponder() or cancel() supersedes it, stops
+    the running search when the player supports stop() and makes its result
+    be dropped. ponder() searches without posting, for players with ponder().
+    Players with stop() need resume(), which is called before each request
+    is started.
+    '''
+
+    def __init__(self, player, post=None):
+        self.player = player
+        self._post = post or _post_event
+        self._requests = queue.Queue()
+        self._request = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def think(self, game):
+        return self._submit('think', game)
+
+    def ponder(self, game):
+        if hasattr(self.player, 'ponder'):
+            self._submit('ponder', game)
+
+    def cancel(self):
+        self._submit(None, None)
+
+    def close(self):
+        self.cancel()
+        self._requests.put(None)
+        self._thread.join()
+
+    def _submit(self, kind, game):
+        self._request += 1
+        if hasattr(self.player, 'stop'):
+            self.player.stop()
+        if kind is not None:
+            self._requests.put((self._request, kind, game.copy()))
+        return self._request
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+
+            number, kind, game = request
+            # resumed before the check: a stop() from a later _submit() then
+            # either skips this request or stops its search
+            if hasattr(self.player, 'resume'):
+                self.player.resume()
+            if number != self._request:
+                continue
+
+            if kind == 'ponder':
+                self.player.ponder(game)
+            else:
+                action = self.player.best_action(game)
+                if number == self._request:
+                    self._post(number, action)
+
+
+def _post_event(request, action):
+    pygame.event.post(
+        pygame.event.Event(AI_EVENT, request=request, action=action))
+
+
 class Dala(object):
-    def __init__(self, debug=False, headless=False):
+    choosing, moving, capturing, thinking = range(4)
+
+    def __init__(self,
+                 debug=False,
+                 headless=False,
+                 fps=30,
+                 players=None,
+                 fade=True):
+        '''players maps the player numbers played by the computer to bots
+        with best_action(game), such as tournament.make_player() builds
+
+        A headless game loads no pygame and needs a bot for each player.
+        '''
+
         self.debug = debug
         self.game = DalaGame()
         self.headless = headless
-        self.updated = True
-        pygame.init()
+        self.fps = fps
+        self.fade = fade
+        self.players = dict(players or {})
+        self.workers = {}
+        self.state = Dala.choosing
+        # the action being put together by clicks
+        self.pending = None
+        self._request = None
+        self._events = deque()
+        # board cell under the mouse as of the last motion handled
+        self._hover = None
+        self._redraw = True
 
-        self.clock = pygame.time.Clock()
         if not self.headless:
+            _load_pygame()
+            pygame.init()
+            self.clock = pygame.time.Clock()
             self._init_display()
+            self.workers = {
+                player: AIWorker(bot)
+                for player, bot in self.players.items()
+            }
 
     def _init_display(self):
+        from display import Display
         self.display = Display(title='Dala', clock=self.clock)
 
     def _update_display(self):
-        if self.updated or True:
+        if self._redraw:
+            # only the cells changed since the last call are redrawn
             self.display.update(self.game)
-            self.updated = False
+            self._redraw = False
+            self.clock.tick(self.fps)
 
-    def reset(self):
-        pass
+    def _next_event(self):
+        '''return the next event worth handling
 
-    def main(self):
-        self.display.display_opening()
+        The queue is drained in one go and runs of motion events are reduced
+        to their last one, which is skipped unless the mouse entered another
+        board cell. The display is redrawn, at most fps times a second, only
+        before waiting for more events.
+        '''
 
         while True:
-            event = pygame.event.wait()
-
-            self._process_restart(event)
-            self._process_quit(event)
-
-            if self._is_mouse_up(event):
-                pos = pygame.mouse.get_pos()
-                position = self.display.get_board_position(pos)
-
-                if position is not None:
-                    if self.game.game_mode() == DalaGame.drop_mode:
-                        if not self._drop_loop(position):
-                            self.display.board.clear_candidates()
-
-                    elif self.game.game_mode() == DalaGame.move_mode:
-                        if not self._move_loop(position):
-                            self.display.board.clear_candidates()
-
-            elif event.type == pygame.MOUSEMOTION:
-                position = self.display.get_board_position(
-                    pygame.mouse.get_pos())
-                if self.game.game_mode() == DalaGame.drop_mode:
-                    self.display.board.update_drop_candidate(self.game,
-                                                             position)
-                elif self.game.game_mode() == DalaGame.move_mode:
-                    self.display.board.update_source_candidate(self.game,
-                                                               position)
-
-            self._update_display()
-
-    def _is_mouse_up(self, event, button=MouseButtons.left):
-        return event.type == pygame.MOUSEBUTTONUP and event.button == button
-
-    def _move_loop(self, source):
-        r, c = source
-
-        if self.game._board[r][c] == self.game.whos_turn():
-            self.display.board.update_source_candidate(self.game, source)
-
-            while True:
-                event = pygame.event.wait()
-
-                self._process_restart(event)
-                self._process_quit(event)
+            if not self._events:
+                self._update_display()
+                events = [pygame.event.wait()]
+                events.extend(pygame.event.get())
 
-                if event.type == pygame.MOUSEMOTION:
-                    pos = pygame.mouse.get_pos()
-                    dest = self.display.get_board_position(pos)
-                    self.display.board.update_destination_candidate(self.game,
-                                                                    dest)
+                for i, event in enumerate(events):
+                    if (event.type != pygame.MOUSEMOTION or i + 1 == len(events)
+                            or events[i + 1].type != pygame.MOUSEMOTION):
+                        self._events.append(event)
 
-                elif self._is_mouse_up(event, MouseButtons.right):
-                    return False
+            event = self._events.popleft()
+            if event.type == pygame.MOUSEMOTION:
+                position = self.display.get_board_position(event.pos)
+                if position == self._hover:
+                    continue
+                self._hover = position
 
-                elif self._is_mouse_up(event):
-                    pos = pygame.mouse.get_pos()
-                    dest = self.display.get_board_position(pos)
+            self._redraw = True
+            return event
 
-                    try:
-                        if dest is not None:
-                            self.game.move(self.game.whos_turn(), source, dest)
-                            return True
+    def reset(self):
+        pass
 
-                    except MustCaptureException:
-                        self.display.board.update_destination_candidate(
-                            self.game, dest)
+    def main(self):
+        if self.headless:
+            return self._autoplay()
 
-                        def action(dala_game, capture):
-                            dala_game.move(dala_game.whos_turn(), source, dest,
-                                           capture)
+        self.display.display_opening(self.fade)
+        self._start_turn()
 
-                        if self._capture_loop(action):
-                            return True
+        while True:
+            event = self._next_event()
 
-                        else:
-                            self.display.board.update_destination_candidate(
-                                self.game, None)
+            self._process_restart(event)
+            self._process_quit(event)
 
-                    except IllegalMoveException as e:
-                        print(e)
+            if event.type == AI_EVENT:
+                if event.request == self._request:
+                    self._play(event.action)
 
-                self._update_display()
+            elif self.state == Dala.thinking:
+                continue
 
-        else:
-            return False
+            elif event.type == pygame.MOUSEMOTION:
+                self._update_candidates(
+                    self.display.get_board_position(event.pos))
 
-    def _drop_loop(self, position):
-        try:
-            self.game.drop(self.game.whos_turn(), position)
+            elif self._is_mouse_up(event, MouseButtons.right):
+                self._choose()
 
-        except MustCaptureException:
-            self.display.board.update_drop_candidate(self.game, position)
+            elif self._is_mouse_up(event):
+                position = self.display.get_board_position(event.pos)
+                if position is not None:
+                    self._click(position)
 
-            def action(dala_game, capture):
-                dala_game.drop(dala_game.whos_turn(), position, capture)
+    def close(self):
+        for worker in self.workers.values():
+            worker.close()
 
-            return self._capture_loop(action)
+    def _autoplay(self):
+        '''play the bots against each other without a display'''
 
-        except IllegalMoveException as e:
-            print(e)
+        if set(self.players) != {0, 1}:
+            raise ValueError('A headless game needs a bot for each player')
 
-    def _capture_loop(self, action):
         while True:
-            event = pygame.event.wait()
+            player = self.players[self.game.whos_turn()]
+            self._play(player.best_action(self.game))
 
-            self._process_restart(event)
-            self._process_quit(event)
+    def _is_mouse_up(self, event, button=MouseButtons.left):
+        return event.type == pygame.MOUSEBUTTONUP and event.button == button
 
-            if event.type == pygame.MOUSEMOTION:
-                pos = pygame.mouse.get_pos()
-                capture = self.display.get_board_position(pos)
-                self.display.board.update_capture_candidate(self.game, capture)
+    def _choose(self):
+        '''wait for the side to move to pick a drop or a piece to move'''
+        self.state = Dala.choosing
+        self.pending = None
+        if not self.headless:
+            self.display.board.clear_candidates()
+
+    def _update_candidates(self, position):
+        board = self.display.board
+
+        if self.state == Dala.capturing:
+            board.update_capture_candidate(self.game, position)
+        elif self.state == Dala.moving:
+            board.update_destination_candidate(self.game, position)
+        elif self.game.game_mode() == DalaGame.drop_mode:
+            board.update_drop_candidate(self.game, position)
+        elif self.game.game_mode() == DalaGame.move_mode:
+            board.update_source_candidate(self.game, position)
+
+    def _click(self, position):
+        player = self.game.whos_turn()
+
+        if self.state == Dala.capturing:
+            action = self.pending._replace(capture=position)
+        elif self.state == Dala.moving:
+            action = Action(self.pending.source, position, None)
+        elif self.game.game_mode() == DalaGame.drop_mode:
+            action = Action(None, position, None)
+        else:
+            r, c = position
+            if self.game.board()[r][c] == player:
+                self.state = Dala.moving
+                self.pending = Action(position, None, None)
+                self.display.board.update_source_candidate(self.game,
+                                                           position)
+            return
+
+        source, destination, capture = action
+        if source is None:
+            status = self.game.check_drop(player, destination, capture)
+        else:
+            status = self.game.check_move(player, source, destination,
+                                          capture)
+
+        if status == Status.OK:
+            self._play(action)
+        elif status == Status.MUST_CAPTURE and self.state != Dala.capturing:
+            self.state = Dala.capturing
+            self.pending = action
+        else:
+            print(status.exception(position))
 
-            elif self._is_mouse_up(event, MouseButtons.right):
-                return False
+    def _play(self, action):
+        self.game.apply(action)
+        self._choose()
 
-            elif self._is_mouse_up(event):
-                pos = pygame.mouse.get_pos()
-                capture = self.display.get_board_position(pos)
+        winner = self.game.winner()
+        if winner is not None:
+            raise GameOverException('player {} wins!'.format(winner))
+        if self.game.draw():
+            raise GameOverException('draw!')
 
-                if capture is not None:
-                    try:
-                        action(self.game, capture)
-                        self.display.board.clear_candidates()
-                        return True
+        self._start_turn()
 
-                    except IllegalMoveException as e:
-                        print(e)
+    def _start_turn(self):
+        '''let a worker think on its turn and ponder on the others'''
 
-            self._update_display()
+        self._request = None
+        player = self.game.whos_turn()
+        for other, worker in self.workers.items():
+            if other == player:
+                self.state = Dala.thinking
+                self._request = worker.think(self.game)
+            else:
+                worker.ponder(self.game)
 
     def _process_quit(self, event):
         if self._is_quit_event(event):
@@ -186,6 +318,8 @@ class Dala(object):
 
     def _process_restart(self, event):
         if event.type == pygame.KEYUP and event.key == pygame.K_F5:
+            for worker in self.workers.values():
+                worker.cancel()
             raise RestartException()
 
     def _is_quit_event(self, event):
@@ -193,8 +327,29 @@ class Dala(object):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play Dala')
+    parser.add_argument('--ai',
+                        type=int,
+                        action='append',
+                        choices=(0, 1),
+                        default=[],
+                        help='let the computer play this player')
+    parser.add_argument('--bot', default='engine:depth=3')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--headless',
+                        action='store_true',
+                        help='play --ai 0 --ai 1 without a window')
+    parser.add_argument('--no-fade', action='store_true')
+    args = parser.parse_args()
+
+    from tournament import make_player
+
     while True:
-        dala = Dala()
+        dala = Dala(headless=args.headless,
+                    fps=args.fps,
+                    players={p: make_player(args.bot)
+                             for p in args.ai},
+                    fade=not args.no_fade)
         try:
             dala.main()
             break
@@ -207,3 +362,9 @@ if __name__ == '__main__':
 
         except GameOverException as e:
             print(e)
+
+        finally:
+            dala.close()
+            for bot in dala.players.values():
+                if hasattr(bot, 'close'):
+                    bot.close()
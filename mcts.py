@@ -0,0 +1,218 @@
+import math
+import random
+import threading
+import time
+
+
+def random_playout(game, rng=random, limit=200):
+    '''play random legal actions in place and return the winner
+
+    Every applied action is undone before returning. None is returned for a
+    draw or when the game is still undecided after limit actions.
+    '''
+
+    steps = 0
+    winner = game.winner()
+
+    while winner is None and steps < limit:
+        actions = list(game.legal_actions())
+        if not actions:
+            if not game.draw():
+                winner = game.next_turn()
+            break
+
+        game.apply(actions[rng.randrange(len(actions))])
+        steps += 1
+        winner = game.winner()
+
+    for _ in range(steps):
+        game.undo()
+
+    return winner
+
+
+class Node(object):
+    def __init__(self, parent, action, player, actions):
+        self.parent = parent
+        self.action = action
+        # the player who chose action to reach this node
+        self.player = player
+        self.untried = actions
+        self.children = []
+        self.visits = 0
+        self.wins = 0.0
+
+    def select(self, exploration):
+        log_visits = math.log(self.visits)
+
+        def uct(child):
+            return (child.wins / child.visits +
+                    exploration * math.sqrt(log_visits / child.visits))
+
+        return max(self.children, key=uct)
+
+
+class MCTSPlayer(object):
+    '''UCT search with optional root parallelism
+
+    With workers > 1 every process grows its own tree from the root and the
+    visit counts of the root actions are summed before choosing. The
+    processes come from executor, or from a pool the player starts on its
+    first search and keeps until close(). stop() reaches the processes of
+    that pool only; searches on executor run to their limits.
+    '''
+
+    def __init__(self,
+                 iterations=1000,
+                 time_limit=None,
+                 workers=1,
+                 exploration=1.4,
+                 playout_limit=200,
+                 seed=None,
+                 executor=None):
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.workers = workers
+        self.exploration = exploration
+        self.playout_limit = playout_limit
+        self.seed = seed
+        self._executor = executor
+        self._owns_executor = executor is None
+
+        if workers > 1 and executor is None:
+            import multiprocessing
+            # handed to the pool processes when they start
+            self._stopped = multiprocessing.Event()
+        else:
+            self._stopped = threading.Event()
+
+    def stop(self):
+        '''make the running search and any later one return the visits so
+        far, until resume()'''
+        self._stopped.set()
+
+    def resume(self):
+        self._stopped.clear()
+
+    def close(self):
+        '''shut down the pool started by the player'''
+
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def best_action(self, game):
+        stats = self.search(game)
+        if not stats:
+            return None
+        return max(stats, key=lambda action: stats[action][0])
+
+    def search(self, game):
+        '''return {action: (visits, wins)} for the root actions'''
+
+        # taken once, so workers starting late do not search longer
+        deadline = (None if self.time_limit is None else time.time() +
+                    self.time_limit)
+
+        rng = random.Random(self.seed)
+        seeds = [rng.getrandbits(32) for _ in range(self.workers)]
+        args = [(game.copy(), self.iterations, deadline, self.exploration,
+                 self.playout_limit, seed) for seed in seeds]
+
+        if self.workers == 1:
+            results = [_search_worker(args[0], self._stopped.is_set)]
+        else:
+            if self._executor is None:
+                # imported here so single-process players load no pool code
+                import concurrent.futures
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(self._stopped, ))
+            results = list(self._executor.map(_search_worker, args))
+
+        stats = {}
+        for result in results:
+            for action, (visits, wins) in result.items():
+                total_visits, total_wins = stats.get(action, (0, 0.0))
+                stats[action] = (total_visits + visits, total_wins + wins)
+
+        return stats
+
+
+def search_tree(game,
+                iterations,
+                deadline,
+                exploration,
+                playout_limit,
+                rng,
+                stopped=None):
+    '''grow one UCT tree on game in place until deadline, a time.time()
+    value or None, or until stopped() and return its root'''
+
+    root = Node(None, None, game.next_turn(), list(game.legal_actions()))
+
+    for _ in range(iterations):
+        if deadline is not None and time.time() > deadline:
+            break
+        if stopped is not None and stopped():
+            break
+
+        node = root
+        depth = 0
+
+        # selection
+        while not node.untried and node.children:
+            node = node.select(exploration)
+            game.apply(node.action)
+            depth += 1
+
+        # expansion
+        if node.untried:
+            action = node.untried.pop(rng.randrange(len(node.untried)))
+            player = game.whos_turn()
+            game.apply(action)
+            depth += 1
+
+            child = Node(node, action, player, list(game.legal_actions()))
+            node.children.append(child)
+            node = child
+
+        # simulation
+        winner = random_playout(game, rng, playout_limit)
+
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner is None:
+                node.wins += 0.5
+            node = node.parent
+
+        for _ in range(depth):
+            game.undo()
+
+    return root
+
+
+_worker_stopped = None
+
+
+def _init_worker(stopped):
+    '''keep the stop event of the player in a pool process'''
+    global _worker_stopped
+    _worker_stopped = stopped
+
+
+def _search_worker(args, stopped=None):
+    game, iterations, deadline, exploration, playout_limit, seed = args
+    if stopped is None and _worker_stopped is not None:
+        stopped = _worker_stopped.is_set
+
+    rng = random.Random(seed)
+    root = search_tree(game, iterations, deadline, exploration, playout_limit,
+                       rng, stopped)
+
+    return {child.action: (child.visits, child.wins)
+            for child in root.children}
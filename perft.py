@@ -0,0 +1,149 @@
+import argparse
+import json
+import sys
+import time
+
+from bitboard import BitboardDalaGame
+from game import DalaGame
+
+BACKENDS = {'list': DalaGame, 'bitboard': BitboardDalaGame}
+
+
+def perft(game, depth):
+    '''count the action sequences of length depth, using apply/undo'''
+
+    if depth == 0:
+        return 1
+
+    nodes = 0
+    for action in list(game.legal_actions()):
+        if depth == 1:
+            nodes += 1
+            continue
+
+        game.apply(action)
+        nodes += perft(game, depth - 1)
+        game.undo()
+
+    return nodes
+
+
+def perft_copy(game, depth):
+    '''count the same sequences as perft() but copy the game per child'''
+
+    if depth == 0:
+        return 1
+
+    nodes = 0
+    for action in list(game.legal_actions()):
+        if depth == 1:
+            nodes += 1
+            continue
+
+        child = game.copy()
+        child.apply(action)
+        nodes += perft_copy(child, depth - 1)
+
+    return nodes
+
+
+def standard_positions(game_class=DalaGame):
+    '''return {name: (game, depth, expected node count)}'''
+
+    _ = DalaGame.empty
+    q = DalaGame.size // 2
+    p = q - 1
+
+    middle = [[DalaGame.empty] * DalaGame.size
+              for i in range(DalaGame.size)]
+    middle[p][p] = middle[p][q] = 0
+    middle[q][p] = middle[q][q] = 1
+
+    end = [
+        [_, _, 1, 0, 1, _],
+        [_, 1, 0, 0, 1, _],
+        [1, 0, 0, 1, 0, _],
+        [_, 0, 1, 0, 0, 1],
+        [_, 1, 0, 0, 1, _],
+        [_, 1, 0, 1, _, _]
+    ] # yapf: disable
+
+    sparse = [
+        [0, _, _, _, _, 1],
+        [_, 0, _, _, 1, _],
+        [_, _, 0, 1, _, _],
+        [_, _, 1, 0, _, _],
+        [_, 1, _, _, 0, _],
+        [1, _, _, _, _, 0]
+    ] # yapf: disable
+
+    remains = [DalaGame.initial_condition, DalaGame.initial_condition]
+    return {
+        'empty': (game_class(), 6, 26720),
+        'middle': (game_class(board=middle, remains=remains), 3, 39258),
+        'end': (game_class(board=end, remains=[0, 0]), 4, 19644),
+        'sparse': (game_class(board=sparse,
+                              remains=[0, 0],
+                              lost=[6, 6]), 4, 82036),
+    }
+
+
+def benchmark(repeat=3):
+    '''return {'<backend>/<method>/<position>': nodes per second}'''
+
+    results = {}
+    for backend, game_class in sorted(BACKENDS.items()):
+        for name, (game, depth, expected) in sorted(
+                standard_positions(game_class).items()):
+            for method, function in (('apply', perft), ('copy', perft_copy)):
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    nodes = function(game, depth)
+                    elapsed = time.perf_counter() - start
+
+                    if nodes != expected:
+                        raise AssertionError(
+                            '{} {} {}: {} nodes, expected {}'.format(
+                                backend, method, name, nodes, expected))
+                    if best is None or elapsed < best:
+                        best = elapsed
+
+                results['{}/{}/{}'.format(backend, method,
+                                          name)] = nodes / best
+
+    return results
+
+
+def regressions(results, baseline, threshold):
+    '''return the keys whose speed fell more than threshold below baseline'''
+
+    return sorted(key for key, speed in results.items()
+                  if key in baseline and speed < baseline[key] *
+                  (1 - threshold))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Count and time legal action sequences')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write the results as a baseline')
+    parser.add_argument('--check', help='compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = benchmark(args.repeat)
+    for key, speed in sorted(results.items()):
+        print('{:32} {:>12.0f} nodes/s'.format(key, speed))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.check:
+        with open(args.check) as f:
+            slower = regressions(results, json.load(f), args.threshold)
+        for key in slower:
+            print('regression: ' + key)
+        if slower:
+            sys.exit(1)
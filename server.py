@@ -0,0 +1,386 @@
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import instrument
+from game import Action, DalaGame, Status
+
+
+class Session(object):
+    '''one game shared by the connections seated at it'''
+
+    def __init__(self, key, game):
+        self.key = key
+        self.game = game
+        self.seats = [None, None]
+        # a drop or move still waiting for its capture
+        self.pending = None
+        self.last_active = time.monotonic()
+
+    def connections(self):
+        return {c for c in self.seats if c is not None}
+
+
+class Connection(object):
+    '''a client socket with a bounded queue of outgoing lines
+
+    Replies are queued with put(), so a client that does not read its
+    replies stops being read from. Events for other clients are queued with
+    push(), which disconnects a client whose queue is already full.
+    '''
+
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.session = None
+        # None when the client plays both seats
+        self.player = None
+        self._outbox = asyncio.Queue(queue_size)
+
+    async def put(self, message):
+        await self._outbox.put(_encode(message))
+
+    def push(self, message):
+        try:
+            self._outbox.put_nowait(_encode(message))
+        except asyncio.QueueFull:
+            self.writer.transport.abort()
+
+    async def send_loop(self):
+        while True:
+            data = await self._outbox.get()
+            if data is None:
+                break
+            if self.writer.is_closing():
+                # keep emptying the queue so put() never blocks
+                continue
+
+            self.writer.write(data)
+            try:
+                await self.writer.drain()
+            except ConnectionError:
+                self.writer.transport.abort()
+
+    async def close(self):
+        await self._outbox.put(None)
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class DalaServer(object):
+    '''host many DalaGame sessions over newline-delimited JSON
+
+    Every request is one JSON object on one line with an 'op' of join,
+    leave, state, drop, move or capture; an optional 'id' is copied to the
+    reply.
+    Replies carry 'ok' and either the game 'state' or an 'error' named
+    after game.Status. Actions of one seat are pushed to the other seat as
+    'update' events.
+    '''
+
+    def __init__(self,
+                 idle_timeout=300,
+                 max_sessions=10000,
+                 queue_size=64,
+                 line_limit=4096,
+                 game_class=DalaGame):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.line_limit = line_limit
+        self.game_class = game_class
+        self.sessions = {}
+
+        self._handlers = set()
+        self._keys = itertools.count(1)
+        self._server = None
+        self._reaper = None
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        '''listen on a Unix socket at path or on host and port'''
+
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle, path, limit=self.line_limit)
+        else:
+            self._server = await asyncio.start_server(self._handle,
+                                                      host,
+                                                      port,
+                                                      limit=self.line_limit)
+
+        self._reaper = asyncio.ensure_future(self._reap_loop())
+        return self._server
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self._server is not None:
+            self._server.close()
+
+        handlers = list(self._handlers)
+        for connection, _ in handlers:
+            connection.writer.transport.abort()
+        await asyncio.gather(*(task for _, task in handlers))
+
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    def reap(self, now=None):
+        '''close the sessions idle for longer than idle_timeout'''
+
+        if now is None:
+            now = time.monotonic()
+
+        for key, session in list(self.sessions.items()):
+            if now - session.last_active > self.idle_timeout:
+                del self.sessions[key]
+                for connection in session.connections():
+                    connection.session = None
+                    connection.push({'event': 'closed', 'game': key})
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 0.01))
+            self.reap()
+
+    async def _handle(self, reader, writer):
+        connection = Connection(writer, self.queue_size)
+        sender = asyncio.ensure_future(connection.send_loop())
+        handler = (connection, asyncio.current_task())
+        self._handlers.add(handler)
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+
+                await connection.put(self._dispatch(connection, line))
+
+        finally:
+            self._leave(connection)
+            await connection.close()
+            await sender
+            writer.close()
+            self._handlers.discard(handler)
+
+    def _dispatch(self, connection, line):
+        if not instrument.enabled:
+            return self._request(connection, line)
+
+        start = time.perf_counter()
+        reply = self._request(connection, line)
+        instrument.add('server.request', time.perf_counter() - start)
+        if not reply['ok']:
+            instrument.add('server.error.' + reply['error'])
+        instrument.gauge('server.sessions', len(self.sessions))
+        return reply
+
+    def _request(self, connection, line):
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ProtocolError('BAD_REQUEST')
+
+            handler = getattr(self, '_op_' + str(request.get('op')), None)
+            if handler is None:
+                raise ProtocolError('UNKNOWN_OP')
+
+            if handler != self._op_join:
+                session = connection.session
+                if session is None:
+                    raise ProtocolError('NOT_JOINED')
+                session.last_active = time.monotonic()
+
+            reply = handler(connection, request)
+
+        except ProtocolError as e:
+            reply = {'ok': False, 'error': e.args[0]}
+        except (KeyError, ValueError, TypeError):
+            reply = {'ok': False, 'error': 'BAD_REQUEST'}
+
+        if isinstance(request, dict) and 'id' in request:
+            reply['id'] = request['id']
+        return reply
+
+    def _op_join(self, connection, request):
+        if connection.session is not None:
+            raise ProtocolError('ALREADY_JOINED')
+
+        key = request.get('game')
+        if key is None:
+            if len(self.sessions) >= self.max_sessions:
+                raise ProtocolError('SERVER_FULL')
+
+            key = next(self._keys)
+            session = Session(key, self.game_class())
+            self.sessions[key] = session
+            player = None if request.get('solo') else 0
+        else:
+            session = self.sessions.get(key)
+            if session is None:
+                raise ProtocolError('UNKNOWN_GAME')
+            if session.seats[0] is None or session.seats[1] is not None:
+                raise ProtocolError('GAME_FULL')
+            player = 1
+
+        if player is None:
+            session.seats = [connection, connection]
+        else:
+            session.seats[player] = connection
+        connection.session = session
+        connection.player = player
+
+        reply = self._reply(session)
+        reply.update(game=key, player=player)
+        return reply
+
+    def _op_leave(self, connection, request):
+        self._leave(connection)
+        return {'ok': True}
+
+    def _op_state(self, connection, request):
+        return self._reply(connection.session)
+
+    def _op_drop(self, connection, request):
+        action = Action(None, _position(request['position']),
+                        _position(request.get('capture')))
+        return self._play(connection, action)
+
+    def _op_move(self, connection, request):
+        action = Action(_position(request['source']),
+                        _position(request['destination']),
+                        _position(request.get('capture')))
+        return self._play(connection, action)
+
+    def _op_capture(self, connection, request):
+        pending = connection.session.pending
+        if pending is None:
+            raise ProtocolError('NOTHING_TO_CAPTURE')
+        return self._play(connection,
+                          pending._replace(capture=_position(
+                              request['position'])))
+
+    def _play(self, connection, action):
+        session = connection.session
+        game = session.game
+        player = connection.player
+        if player is None:
+            player = game.whos_turn()
+
+        source, destination, capture = action
+        if source is None:
+            status = game.check_drop(player, destination, capture)
+        else:
+            status = game.check_move(player, source, destination, capture)
+
+        if status == Status.MUST_CAPTURE:
+            session.pending = action
+        elif status == Status.OK:
+            session.pending = None
+            game.apply(action)
+
+            update = self._reply(session)
+            update['event'] = 'update'
+            for other in session.connections():
+                if other is not connection:
+                    other.push(update)
+        if status:
+            raise ProtocolError(status.name)
+
+        return self._reply(session)
+
+    def _reply(self, session):
+        game = session.game
+        return {
+            'ok': True,
+            'state': {
+                'board': game.board(),
+                'turn': game.whos_turn(),
+                'remains': [game.remains(0), game.remains(1)],
+                'lost': [game.lost(0), game.lost(1)],
+                'mode': game.game_mode(),
+                'winner': game.winner(),
+                'draw': game.draw(),
+            }
+        }
+
+    def _leave(self, connection):
+        session = connection.session
+        if session is None:
+            return
+
+        connection.session = None
+        session.seats = [None if c is connection else c for c in session.seats]
+        if not session.connections():
+            self.sessions.pop(session.key, None)
+        else:
+            for other in session.connections():
+                other.push({'event': 'left', 'game': session.key})
+
+
+def game_from_state(state, game_class=DalaGame):
+    '''rebuild a game from the 'state' of a reply'''
+    return game_class(board=state['board'],
+                      remains=state['remains'],
+                      lost=state['lost'],
+                      turn=state['turn'],
+                      winner=state['winner'])
+
+
+def _position(value):
+    if value is None:
+        return None
+
+    r, c = value
+    if type(r) is not int or type(c) is not int:
+        raise ValueError(value)
+    return (r, c)
+
+
+def _encode(message):
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+async def _main(args):
+    server = DalaServer(idle_timeout=args.idle_timeout,
+                        max_sessions=args.max_sessions,
+                        queue_size=args.queue_size)
+    await server.start(args.host, args.port, args.unix)
+    print('serving on ' + (args.unix or '{}:{}'.format(args.host, args.port)))
+    await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve Dala games')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on a Unix socket instead')
+    parser.add_argument('--idle-timeout', type=float, default=300)
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--instrument',
+                        action='store_true',
+                        help='print call counts and timings on exit')
+    args = parser.parse_args()
+
+    if args.instrument:
+        instrument.enable()
+
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+    if args.instrument:
+        print(instrument.REGISTRY.prometheus(), end='')
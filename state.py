@@ -0,0 +1,235 @@
+from bitboard import bit_masks
+from game import DalaGame
+
+
+class GameState(object):
+    '''immutable snapshot of a DalaGame
+
+    Each player's pieces are one integer bit mask (cell (r, c) is bit
+    r * size + c) and the counters are tuples, so a state is a handful of
+    words, hashes to the Zobrist key of the equivalent DalaGame and can be
+    shared between threads without locking.
+    '''
+
+    __slots__ = ('_pieces', '_remains', '_lost', '_turn', '_winner', '_hash',
+                 '_rules')
+
+    def __init__(self,
+                 pieces=(0, 0),
+                 remains=None,
+                 lost=(0, 0),
+                 turn=0,
+                 winner=None,
+                 rules=None):
+        if rules is None:
+            rules = DalaGame.rules
+        if remains is None:
+            remains = (rules.num_of_pieces, rules.num_of_pieces)
+
+        h = rules.turn_keys[turn]
+        for player in range(2):
+            h ^= rules.remains_keys[player][remains[player]]
+            h ^= rules.lost_keys[player][lost[player]]
+
+            bits = pieces[player]
+            while bits:
+                low = bits & -bits
+                h ^= rules.piece_keys[player][low.bit_length() - 1]
+                bits ^= low
+
+        self._init(tuple(pieces), tuple(remains), tuple(lost), turn, winner, h,
+                   rules)
+
+    def _init(self, pieces, remains, lost, turn, winner, h, rules):
+        set_attribute = object.__setattr__
+        set_attribute(self, '_pieces', pieces)
+        set_attribute(self, '_remains', remains)
+        set_attribute(self, '_lost', lost)
+        set_attribute(self, '_turn', turn)
+        set_attribute(self, '_winner', winner)
+        set_attribute(self, '_hash', h)
+        set_attribute(self, '_rules', rules)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('GameState is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('GameState is immutable')
+
+    def __eq__(self, other):
+        if isinstance(other, GameState):
+            return (self._hash == other._hash and
+                    self._rules is other._rules and
+                    self._pieces == other._pieces and
+                    self._remains == other._remains and
+                    self._lost == other._lost and self._turn == other._turn)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return (GameState, (self._pieces, self._remains, self._lost,
+                            self._turn, self._winner, self._rules))
+
+    def __repr__(self):
+        text = 'GameState(pieces={}, remains={}, lost={}, turn={}, winner={}'.format(
+            self._pieces, self._remains, self._lost, self._turn, self._winner)
+        if self._rules is not DalaGame.rules:
+            text += ', rules={!r}'.format(self._rules)
+        return text + ')'
+
+    @classmethod
+    def from_game(cls, game):
+        size = game.size
+        pieces = [0, 0]
+        for player in range(2):
+            for r, c in game._positions_of(player):
+                pieces[player] |= 1 << (r * size + c)
+
+        state = cls.__new__(cls)
+        state._init(tuple(pieces), (game.remains(0), game.remains(1)),
+                    (game.lost(0), game.lost(1)), game.whos_turn(),
+                    game._winner, game.hash(), game.rules)
+        return state
+
+    def to_game(self, game_class=DalaGame):
+        return game_class(board=self.board(),
+                          remains=list(self._remains),
+                          lost=list(self._lost),
+                          turn=self._turn,
+                          winner=self._winner,
+                          rules=self._rules)
+
+    def hash(self):
+        '''64-bit Zobrist key, equal to DalaGame.hash() of the same game'''
+        return self._hash
+
+    @property
+    def rules(self):
+        return self._rules
+
+    def board(self):
+        size = self._rules.size
+        board = [[DalaGame.empty] * size for i in range(size)]
+        for player in range(2):
+            bits = self._pieces[player]
+            while bits:
+                low = bits & -bits
+                r, c = divmod(low.bit_length() - 1, size)
+                board[r][c] = player
+                bits ^= low
+        return board
+
+    def whos_turn(self):
+        return self._turn
+
+    def remains(self, player):
+        return self._remains[player]
+
+    def lost(self, player):
+        return self._lost[player]
+
+    def game_mode(self):
+        if self._turn == DalaGame.empty or self.winner() is not None:
+            return DalaGame.end_mode
+        elif self._remains[self._turn] > 0:
+            return DalaGame.drop_mode
+        else:
+            return DalaGame.move_mode
+
+    def draw(self):
+        '''whether the game ended without a winner'''
+        return self._turn == DalaGame.empty and self.winner() is None
+
+    def winner(self):
+        if self._winner is not None:
+            return self._winner
+
+        for i in range(2):
+            if self._lost[i] >= self._rules.lost_condition:
+                return 1 - i
+
+        turn = self._turn
+        if (turn != DalaGame.empty and self._remains[turn] == 0 and
+                not self._movable(turn)):
+            return 1 - turn
+        return None
+
+    def step(self, action):
+        '''return the state after an action from legal_actions()
+
+        Like DalaGame.apply(), the action is not validated. A state keeps no
+        history, so the repetition and no-capture draws are never applied.
+        '''
+
+        source, destination, capture = action
+        player = self._turn
+        opponent = 1 - player
+        pieces = list(self._pieces)
+        remains = self._remains
+        lost = self._lost
+        winner = self._winner
+        rules = self._rules
+        size = rules.size
+        keys = rules.piece_keys[player]
+
+        cell = destination[0] * size + destination[1]
+        pieces[player] |= 1 << cell
+        h = self._hash ^ keys[cell]
+
+        if source is None:
+            n = remains[player]
+            remains = ((n - 1, remains[1]) if player == 0 else
+                       (remains[0], n - 1))
+            keys = rules.remains_keys[player]
+            h ^= keys[n] ^ keys[n - 1]
+        else:
+            cell = source[0] * size + source[1]
+            pieces[player] &= ~(1 << cell)
+            h ^= keys[cell]
+
+        next_turn = opponent
+        if capture is not None:
+            cell = capture[0] * size + capture[1]
+            pieces[opponent] &= ~(1 << cell)
+            n = lost[opponent]
+            lost = (n + 1, lost[1]) if opponent == 0 else (lost[0], n + 1)
+            h ^= (rules.piece_keys[opponent][cell] ^
+                  rules.lost_keys[opponent][n] ^
+                  rules.lost_keys[opponent][n + 1])
+            if n + 1 >= rules.lost_condition:
+                next_turn = DalaGame.empty
+
+        if (next_turn != DalaGame.empty and remains[next_turn] == 0 and
+                not _movable(pieces, next_turn, rules)):
+            winner = player
+            next_turn = DalaGame.empty
+
+        h ^= rules.turn_keys[player] ^ rules.turn_keys[next_turn]
+
+        state = GameState.__new__(GameState)
+        state._init(tuple(pieces), remains, lost, next_turn, winner, h, rules)
+        return state
+
+    def legal_actions(self):
+        return self.to_game().legal_actions()
+
+    def _movable(self, player):
+        return _movable(self._pieces, player, self._rules)
+
+
+def _movable(pieces, player, rules):
+    '''whether a piece of player has an empty orthogonal neighbour'''
+
+    masks = bit_masks(rules)
+    size = rules.size
+    own = pieces[player]
+    empty = masks.full & ~(pieces[0] | pieces[1])
+    return bool(((own << size) | (own >> size) |
+                 ((own & ~masks.last_column) << 1) |
+                 ((own & ~masks.first_column) >> 1)) & empty)
@@ -0,0 +1,462 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import combinations
+from math import comb
+
+from bitboard import build_lines
+from game import DalaGame
+
+WIN, LOSS, DRAW = range(3)
+
+_MAGIC = b'DALATB1\0'
+# magic, board size, losing pieces, fewer pieces, more pieces
+_HEADER = struct.Struct('<8sBBBB')
+_VALUE = struct.Struct('<H')
+
+_DRAW_CHILD, _HAS_MOVE = 1, 2
+
+
+class Geometry(object):
+    '''board tables shared by the generator and the lookup'''
+
+    def __init__(self, size=DalaGame.size,
+                 losing_pieces=DalaGame.num_of_pieces -
+                 DalaGame.lost_condition):
+        self.size = size
+        self.cells = size * size
+        self.losing_pieces = losing_pieces
+        self.through, self.beside = build_lines(size)
+
+        neighbours = []
+        for cell in range(self.cells):
+            r, c = divmod(cell, size)
+            neighbours.append(tuple(nr * size + nc
+                                    for nr, nc in ((r - 1, c), (r + 1, c),
+                                                   (r, c - 1), (r, c + 1))
+                                    if 0 <= nr < size and 0 <= nc < size))
+        self.neighbours = tuple(neighbours)
+
+    def is_capture(self, own, source, destination):
+        '''tell whether own, after moving source to destination, captures'''
+
+        for segment, fence in self.through[destination]:
+            if own & segment == segment and not own & fence:
+                return True
+        for segment, fence in self.beside[source]:
+            if own & segment == segment and not own & fence:
+                return True
+        return False
+
+    def successors(self, mover, other):
+        '''yield (mover, other, captured) after every move of mover
+
+        The returned pair is seen from the side to move next, so it is the
+        opponent's pieces followed by the pieces of the side that moved.
+        '''
+
+        occupied = mover | other
+        pieces = mover
+        while pieces:
+            low = pieces & -pieces
+            pieces ^= low
+            source = low.bit_length() - 1
+
+            for destination in self.neighbours[source]:
+                if occupied >> destination & 1:
+                    continue
+
+                own = mover ^ low ^ (1 << destination)
+                if self.is_capture(own, source, destination):
+                    targets = other
+                    while targets:
+                        target = targets & -targets
+                        targets ^= target
+                        yield other ^ target, own, True
+                else:
+                    yield other, own, False
+
+    def predecessors(self, mover, other):
+        '''yield (mover, other) of positions reaching this one without capture'''
+
+        occupied = mover | other
+        pieces = other
+        while pieces:
+            low = pieces & -pieces
+            pieces ^= low
+            destination = low.bit_length() - 1
+
+            for source in self.neighbours[destination]:
+                if occupied >> source & 1:
+                    continue
+                if self.is_capture(other, source, destination):
+                    continue
+                yield other ^ low ^ (1 << source), mover
+
+    def parts(self, fewer, more):
+        '''return [(mover pieces, other pieces, offset)] and the total size'''
+
+        parts = []
+        offset = 0
+        for a, b in ((fewer, more), (more, fewer))[:1 if fewer == more else 2]:
+            parts.append((a, b, offset))
+            offset += comb(self.cells, a) * comb(self.cells - a, b)
+        return parts, offset
+
+    def index(self, mover, other):
+        a = mover.bit_count()
+        b = other.bit_count()
+        parts, _ = self.parts(min(a, b), max(a, b))
+        offset = parts[0][2] if a <= b else parts[-1][2]
+
+        return (offset + _rank(mover) * comb(self.cells - a, b) +
+                _rank_other(other, mover))
+
+    def position(self, index, fewer, more):
+        '''inverse of index() within the (fewer, more) file'''
+
+        parts, _ = self.parts(fewer, more)
+        for a, b, offset in reversed(parts):
+            if index >= offset:
+                break
+
+        first, second = divmod(index - offset, comb(self.cells - a, b))
+        mover = _unrank(first, a)
+        free = [cell for cell in range(self.cells) if not mover >> cell & 1]
+
+        other = 0
+        compressed = _unrank(second, b)
+        while compressed:
+            low = compressed & -compressed
+            compressed ^= low
+            other |= 1 << free[low.bit_length() - 1]
+
+        return mover, other
+
+
+class Tablebase(object):
+    '''read-only access to generated files through mmap
+
+    Results are seen from the side to move: (WIN, n) means the side to move
+    wins in n plies with best play, (LOSS, n) that it loses in n plies.
+    '''
+
+    def __init__(self, directory, geometry=None):
+        self.directory = directory
+        self.geometry = geometry or Geometry()
+        self._maps = {}
+
+    def close(self):
+        for entry in self._maps.values():
+            if entry is not None:
+                entry[1].close()
+                entry[0].close()
+        self._maps = {}
+
+    def probe(self, game):
+        '''return (result, distance) for a move-phase game or None
+
+        Games whose lost counts disagree with the pieces on the board are
+        not in the tables, which assume every missing piece was captured.
+        '''
+
+        geometry = self.geometry
+        if (game.size != geometry.size or game.num_of_pieces -
+                game.lost_condition != geometry.losing_pieces):
+            return None
+
+        player = game.whos_turn()
+        if (player == DalaGame.empty or game.winner() is not None or
+                game.remains(0) > 0 or game.remains(1) > 0):
+            return None
+
+        size = geometry.size
+        bits = [0, 0]
+        for i in range(2):
+            for r, c in game._positions_of(i):
+                bits[i] |= 1 << (r * size + c)
+            if game.lost(i) != game.num_of_pieces - bits[i].bit_count():
+                return None
+
+        return self.probe_bits(bits[player], bits[1 - player])
+
+    def probe_bits(self, mover, other):
+        a = mover.bit_count()
+        b = other.bit_count()
+        if min(a, b) <= self.geometry.losing_pieces:
+            return None
+
+        entry = self._open(min(a, b), max(a, b))
+        if entry is None:
+            return None
+
+        index = self.geometry.index(mover, other)
+        value, = _VALUE.unpack_from(entry[1], _HEADER.size + 2 * index)
+        return _decode(value)
+
+    def _open(self, fewer, more):
+        key = (fewer, more)
+        if key not in self._maps:
+            path = os.path.join(self.directory,
+                                _filename(self.geometry, fewer, more))
+            if os.path.exists(path):
+                f = open(path, 'rb')
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, size, losing_pieces, _, _ = _HEADER.unpack_from(data)
+                if (magic != _MAGIC or size != self.geometry.size or
+                        losing_pieces != self.geometry.losing_pieces):
+                    data.close()
+                    f.close()
+                    raise ValueError('Not a matching tablebase: ' + path)
+                self._maps[key] = (f, data)
+            else:
+                self._maps[key] = None
+
+        return self._maps[key]
+
+
+def generate(directory, max_pieces=3, workers=None, geometry=None):
+    '''solve every material balance up to max_pieces per side
+
+    Balances are solved from the fewest pieces up, since captures only lead
+    to smaller ones, and each one is written to its own file. Files that
+    already exist are kept, so an interrupted run resumes where it stopped.
+    '''
+
+    geometry = geometry or Geometry()
+    os.makedirs(directory, exist_ok=True)
+
+    balances = [(fewer, more)
+                for fewer in range(geometry.losing_pieces + 1, max_pieces + 1)
+                for more in range(fewer, max_pieces + 1)]
+    balances.sort(key=lambda balance: (sum(balance), balance))
+
+    paths = []
+    for fewer, more in balances:
+        path = os.path.join(directory, _filename(geometry, fewer, more))
+        if not os.path.exists(path):
+            values = _solve(directory, geometry, fewer, more, workers)
+            _write(path, geometry, fewer, more, values)
+        paths.append(path)
+
+    return paths
+
+
+def _solve(directory, geometry, fewer, more, workers):
+    parts, total = geometry.parts(fewer, more)
+
+    counts = array('B', bytes(total))
+    wins = array('H', bytes(2 * total))
+    depths = array('H', bytes(2 * total))
+    flags = array('B', bytes(total))
+
+    jobs = []
+    for a, b, offset in parts:
+        step = comb(geometry.cells - a, b)
+        firsts = comb(geometry.cells, a)
+        chunk = max(1, firsts // (4 * (workers or os.cpu_count() or 1)))
+        for first in range(0, firsts, chunk):
+            jobs.append((directory, geometry.size, geometry.losing_pieces, a,
+                         b, offset, step, first, min(first + chunk, firsts)))
+
+    if workers == 1:
+        results = map(_scan_chunk, jobs)
+        executor = None
+    else:
+        # imported here so probing the tables loads no pool code
+        import concurrent.futures
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers)
+        results = executor.map(_scan_chunk, jobs)
+
+    try:
+        for start, chunk_counts, chunk_wins, chunk_depths, chunk_flags in results:
+            stop = start + len(chunk_counts)
+            counts[start:stop] = chunk_counts
+            wins[start:stop] = chunk_wins
+            depths[start:stop] = chunk_depths
+            flags[start:stop] = chunk_flags
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    values = array('H', bytes(2 * total))
+    buckets = {}
+
+    def push(distance, index, result):
+        buckets.setdefault(distance, []).append((index, result))
+
+    for index in range(total):
+        if wins[index]:
+            push(wins[index], index, WIN)
+        elif counts[index] == 0 and not flags[index] & _DRAW_CHILD:
+            push(depths[index], index, LOSS)
+
+    distance = 0
+    while buckets:
+        for index, result in buckets.pop(distance, ()):
+            if values[index]:
+                continue
+            values[index] = _encode(result, distance)
+
+            mover, other = geometry.position(index, fewer, more)
+            for previous in geometry.predecessors(mover, other):
+                parent = geometry.index(*previous)
+                if values[parent]:
+                    continue
+
+                if result == LOSS:
+                    push(distance + 1, parent, WIN)
+                else:
+                    counts[parent] -= 1
+                    if depths[parent] < distance + 1:
+                        depths[parent] = distance + 1
+                    if (counts[parent] == 0 and not wins[parent] and
+                            not flags[parent] & _DRAW_CHILD):
+                        push(depths[parent], parent, LOSS)
+        distance += 1
+
+    return values
+
+
+def _scan_chunk(job):
+    '''count in-file children and resolve captures for a range of positions
+
+    Captures lead to smaller, already solved balances, or end the game.
+    '''
+
+    directory, size, losing_pieces, a, b, offset, step, first, stop = job
+    geometry = Geometry(size, losing_pieces)
+    tablebase = Tablebase(directory, geometry)
+
+    cells = geometry.cells
+    length = (stop - first) * step
+    counts = array('B', bytes(length))
+    wins = array('H', bytes(2 * length))
+    depths = array('H', bytes(2 * length))
+    flags = array('B', bytes(length))
+
+    try:
+        for first_rank in range(first, stop):
+            mover = _unrank(first_rank, a)
+            free = [cell for cell in range(cells) if not mover >> cell & 1]
+            base = (first_rank - first) * step
+
+            for combination in combinations(range(len(free)), b):
+                i = base + sum(comb(c, j + 1)
+                               for j, c in enumerate(combination))
+                other = 0
+                for c in combination:
+                    other |= 1 << free[c]
+
+                count = win = depth = flag = 0
+                for child_mover, child_other, captured in geometry.successors(
+                        mover, other):
+                    flag |= _HAS_MOVE
+                    if not captured:
+                        count += 1
+                        continue
+
+                    if child_mover.bit_count() <= losing_pieces:
+                        win = 1
+                        continue
+
+                    result, distance = tablebase.probe_bits(child_mover,
+                                                            child_other)
+                    if result == LOSS:
+                        if not win or distance + 1 < win:
+                            win = distance + 1
+                    elif result == WIN:
+                        depth = max(depth, distance + 1)
+                    else:
+                        flag |= _DRAW_CHILD
+
+                counts[i] = count
+                wins[i] = win
+                depths[i] = depth
+                flags[i] = flag
+    finally:
+        tablebase.close()
+
+    return offset + first * step, counts, wins, depths, flags
+
+
+def _write(path, geometry, fewer, more, values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    partial = path + '.part'
+    with open(partial, 'wb') as f:
+        f.write(
+            _HEADER.pack(_MAGIC, geometry.size, geometry.losing_pieces, fewer,
+                         more))
+        values.tofile(f)
+    os.replace(partial, path)
+
+
+def _filename(geometry, fewer, more):
+    return 'dala-{0}x{0}-{1}-{2}.dtb'.format(geometry.size, fewer, more)
+
+
+def _encode(result, distance):
+    return 2 * distance + (1 if result == WIN else 2)
+
+
+def _decode(value):
+    if value == 0:
+        return DRAW, 0
+    elif value & 1:
+        return WIN, (value - 1) // 2
+    else:
+        return LOSS, (value - 2) // 2
+
+
+def _rank(bits):
+    rank = 0
+    i = 1
+    while bits:
+        low = bits & -bits
+        bits ^= low
+        rank += comb(low.bit_length() - 1, i)
+        i += 1
+    return rank
+
+
+def _rank_other(other, mover):
+    '''rank of other among the cells left free by mover'''
+
+    rank = 0
+    i = 1
+    while other:
+        low = other & -other
+        other ^= low
+        cell = low.bit_length() - 1 - (mover & (low - 1)).bit_count()
+        rank += comb(cell, i)
+        i += 1
+    return rank
+
+
+def _unrank(rank, k):
+    bits = 0
+    for i in range(k, 0, -1):
+        cell = i - 1
+        while comb(cell + 1, i) <= rank:
+            cell += 1
+        rank -= comb(cell, i)
+        bits |= 1 << cell
+    return bits
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Generate move-phase Dala tablebases')
+    parser.add_argument('directory')
+    parser.add_argument('--max-pieces', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    for path in generate(args.directory, args.max_pieces, args.workers):
+        print(path)
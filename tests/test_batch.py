@@ -0,0 +1,122 @@
+import random
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from exceptions import *
+from game import DalaGame, Rules
+
+from tests.test_game import (TestDraw, get_corner_game, get_end_game,
+                              get_middle_game)
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestBatchDalaGame(unittest.TestCase):
+    def test_cross_check(self):
+        '''Batch games must replay identically through DalaGame'''
+        for limit in (None, 12):
+            games = [DalaGame() for _ in range(16)]
+            games += [get_middle_game(), get_end_game(), get_corner_game()]
+            for game in games:
+                if limit is not None:
+                    game.no_capture_limit = limit
+            self.cross_check(games, random.Random(1))
+
+    def test_rules(self):
+        '''Batches of 5x5 and 8x8 games must replay through DalaGame'''
+        for rules in (Rules.get(5, 8), Rules.get(8, 16)):
+            games = [DalaGame(rules=rules, no_capture_limit=12)
+                     for _ in range(8)]
+            self.cross_check(games, random.Random(1))
+
+    def test_draws(self):
+        '''Repetitions must draw in the batch as well'''
+        from batch import BatchDalaGame
+
+        game = get_corner_game()
+        for action in TestDraw.shuffle:
+            game.apply(action)
+        batch = BatchDalaGame.from_games([game, get_end_game()])
+        self.assertEqual(batch.game(0).repetitions(), 2)
+
+        for action in TestDraw.shuffle:
+            batch.step_actions([action, None])
+            game.apply(action)
+        self.assertTrue(game.draw())
+        self.assertEqual(batch.draws().tolist(), [True, False])
+        self.assertEqual(batch.game_modes().tolist(),
+                         [DalaGame.end_mode, DalaGame.move_mode])
+        self.assertEqual(batch.game(0), game)
+        self.assertTrue(batch.game(0).draw())
+
+    def cross_check(self, games, rng):
+        from batch import BatchDalaGame
+
+        batch = BatchDalaGame.from_games(games)
+        for _ in range(500):
+            actions = []
+            for game in games:
+                legal = list(game.legal_actions())
+                action = rng.choice(legal) if legal else None
+                if action is not None:
+                    game.apply(action)
+                actions.append(action)
+
+            if all(action is None for action in actions):
+                break
+
+            batch.step_actions(actions)
+
+            for i, game in enumerate(games):
+                self.assertEqual(batch.game(i), game)
+                self.assertEqual(batch.game(i).winner(), game.winner())
+                self.assertEqual(batch.game(i).repetitions(),
+                                 game.repetitions())
+                self.assertEqual(batch.game_modes()[i], game.game_mode())
+
+        self.assertTrue(any(game.draw() for game in games))
+
+    def test_immobile(self):
+        '''A side left without moves must lose in the batch as well'''
+        from batch import BatchDalaGame
+
+        _ = DalaGame.empty
+        board = [[_] * DalaGame.size for i in range(DalaGame.size)]
+        board[0][:3] = [1, 1, 0]
+        board[1][:2] = [1, 0]
+        board[3][0] = 0
+        game = DalaGame(board=board, remains=[0, 0], lost=[9, 9])
+
+        batch = BatchDalaGame.from_games([game, game.copy()])
+        batch.step([[3, 0], [-1, -1]], [[2, 0], [-1, -1]],
+                   [[-1, -1], [-1, -1]])
+        self.assertEqual(batch.winners.tolist(), [0, DalaGame.empty])
+        self.assertEqual(batch.game_modes().tolist(),
+                         [DalaGame.end_mode, DalaGame.move_mode])
+
+    def test_capture_checks(self):
+        '''Missing or superfluous captures must be rejected'''
+        from batch import BatchDalaGame
+
+        batch = BatchDalaGame.from_games([get_middle_game()])
+        before = batch.boards.copy()
+
+        self.assertRaises(MustCaptureException, batch.step, [[-1, -1]],
+                          [[2, 4]], [[-1, -1]])
+        self.assertRaises(MustNotCaptureException, batch.step, [[-1, -1]],
+                          [[1, 2]], [[3, 2]])
+        self.assertRaises(IllegalCapturePositionException, batch.step,
+                          [[-1, -1]], [[2, 4]], [[2, 2]])
+        self.assertTrue(np.array_equal(batch.boards, before))
+
+        batch.step([[-1, -1]], [[2, 4]], [[3, 3]])
+        game = get_middle_game()
+        game.drop(0, (2, 4), (3, 3))
+        self.assertEqual(batch.game(0), game)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,86 @@
+import random
+import unittest
+
+from bitboard import BitboardDalaGame
+from game import DalaGame
+
+from exceptions import *
+from tests import test_game
+
+
+class TestBitboardProgress(test_game.TestProgress):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardIllegalMoves(test_game.TestIllegalMoves):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardLegalActions(test_game.TestLegalActions):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardCheck(test_game.TestCheck):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardApplyUndo(test_game.TestApplyUndo):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardHash(test_game.TestHash):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardMobility(test_game.TestMobility):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardDraw(test_game.TestDraw):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardSymmetry(test_game.TestSymmetry):
+    game_class = BitboardDalaGame
+
+
+class TestBitboardRules(test_game.TestRules):
+    game_class = BitboardDalaGame
+
+
+class TestBackendAgreement(unittest.TestCase):
+    def test_same_outcomes(self):
+        '''Both backends must accept and reject the same actions'''
+        for _ in range(20):
+            lgame = DalaGame()
+            bgame = BitboardDalaGame()
+
+            for _ in range(2000):
+                player = lgame.whos_turn()
+                pos = test_game.random_position()
+                dpos = test_game.random_move(pos)
+                cpos = test_game.random_position() if random.random(
+                ) < 0.5 else None
+
+                results = []
+                for game in (lgame, bgame):
+                    try:
+                        if game.game_mode() == DalaGame.drop_mode:
+                            game.drop(player, pos, cpos)
+                        else:
+                            game.move(player, pos, dpos, cpos)
+                        results.append(None)
+                    except DalaException as e:
+                        results.append(type(e))
+
+                self.assertEqual(results[0], results[1])
+                self.assertEqual(lgame, bgame)
+                self.assertEqual(lgame.board(), bgame.board())
+                self.assertEqual(lgame.hash(), bgame.hash())
+
+                if GameOverException in results:
+                    break
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
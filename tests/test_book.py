@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from book import OpeningBook, build, drop_positions
+from engine import Engine
+from game import TRANSFORMS, DalaGame
+
+from tests.test_game import transformed
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'book.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_positions(self):
+        '''Symmetric positions must only be listed once'''
+        games = drop_positions(2)
+        self.assertEqual(len(games), len({g.hash() for g in games}))
+        self.assertEqual([g.canonical()[0] for g in games], games)
+
+    def test_lookup(self):
+        '''Every symmetric variant of a book position must find its move'''
+        count = build(self.path, plies=3, depth=1, workers=1)
+        book = OpeningBook(self.path)
+        self.assertEqual(len(book), count)
+        self.assertEqual(list(book), sorted(book))
+
+        for game in drop_positions(3):
+            if game.game_mode() != DalaGame.drop_mode:
+                continue
+
+            for transform in TRANSFORMS:
+                ngame = transformed(game, transform)
+                moves = book.lookup(ngame)
+                self.assertEqual(len(moves), 1)
+                self.assertIn(moves[0][0], list(ngame.legal_actions()))
+
+        self.assertEqual(book.lookup(DalaGame(remains=[3, 3])), [])
+
+        action = Engine(book=book).search(DalaGame()).action
+        self.assertEqual(action, book.lookup(DalaGame())[0][0])
+        book.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,139 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from bitboard import BitboardDalaGame
+from codec import (STATE_SIZE, GameRecordWriter, decode, encode, read_games,
+                   state_size)
+from game import DalaGame, Rules
+
+from tests.test_game import (TestDraw, get_corner_game, get_end_game,
+                              get_middle_game)
+
+
+def random_game(rng, limit=300, rules=None):
+    dgame = DalaGame(rules=rules)
+    actions = []
+    for _ in range(limit):
+        legal = list(dgame.legal_actions())
+        if not legal:
+            break
+        action = rng.choice(legal)
+        dgame.apply(action)
+        actions.append(action)
+    return dgame, actions
+
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        '''Decoding must restore every part of the state'''
+        rng = random.Random(1)
+        games = [DalaGame(), get_middle_game(), get_end_game(),
+                 DalaGame(board=get_end_game().board(),
+                          remains=[0, 0],
+                          winner=1)]
+        games += [random_game(rng, rng.randrange(200))[0] for _ in range(20)]
+
+        for dgame in games:
+            data = encode(dgame)
+            self.assertEqual(len(data), STATE_SIZE)
+
+            for game_class in (DalaGame, BitboardDalaGame):
+                ngame = decode(data, game_class)
+                self.assertEqual(ngame, dgame)
+                self.assertEqual(ngame.winner(), dgame.winner())
+                self.assertEqual(encode(ngame), data)
+
+    def test_rules(self):
+        '''Games of other sizes must take their own state size'''
+        rng = random.Random(3)
+        for rules in (Rules.get(5, 8), Rules.get(8, 16)):
+            for _ in range(10):
+                dgame = random_game(rng, rng.randrange(200), rules)[0]
+                data = encode(dgame)
+                self.assertEqual(len(data), state_size(rules))
+
+                for game_class in (DalaGame, BitboardDalaGame):
+                    ngame = decode(data, game_class, rules)
+                    self.assertIs(ngame.rules, rules)
+                    self.assertEqual(ngame, dgame)
+        self.assertLess(state_size(Rules.get(5, 8)), STATE_SIZE)
+
+
+class TestGameRecords(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'games.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        '''Games must be read back in order, across appends'''
+        rng = random.Random(1)
+        games = [random_game(rng)[1] for _ in range(10)]
+        games.append([])
+
+        with GameRecordWriter(self.path, checkpoint_interval=7,
+                              buffer_size=100) as writer:
+            for actions in games[:5]:
+                writer.write_game(DalaGame(), actions)
+
+        with GameRecordWriter(self.path) as writer:
+            for actions in games[5:]:
+                writer.write_game(DalaGame(), actions)
+
+        records = list(read_games(self.path, verify=True, chunk_size=64))
+        self.assertEqual([actions for _, actions in records], games)
+        for game, _ in records:
+            self.assertEqual(game, DalaGame())
+
+    def test_repetitions(self):
+        '''Games already holding repetitions must replay like a reader'''
+        dgame = get_corner_game()
+        for action in TestDraw.shuffle:
+            dgame.apply(action)
+
+        with GameRecordWriter(self.path, checkpoint_interval=2) as writer:
+            writer.write_game(dgame, TestDraw.shuffle * 2)
+
+        records = list(read_games(self.path, verify=True))
+        self.assertEqual(records, [(dgame, TestDraw.shuffle * 2)])
+
+    def test_rules(self):
+        '''Records must hold games of the rules they were opened with'''
+        rng = random.Random(4)
+        rules = Rules.get(8, 16)
+        games = [random_game(rng, rules=rules)[1] for _ in range(3)]
+
+        with GameRecordWriter(self.path, rules=rules) as writer:
+            for actions in games:
+                writer.write_game(DalaGame(rules=rules), actions)
+            with self.assertRaises(ValueError):
+                writer.write_game(DalaGame(), [])
+
+        records = list(read_games(self.path, verify=True, rules=rules))
+        self.assertEqual([actions for _, actions in records], games)
+        for game, _ in records:
+            self.assertEqual(game, DalaGame(rules=rules))
+
+    def test_truncated(self):
+        '''A partially written last game must be skipped'''
+        rng = random.Random(2)
+        games = [random_game(rng)[1] for _ in range(3)]
+
+        with GameRecordWriter(self.path) as writer:
+            for actions in games:
+                writer.write_game(DalaGame(), actions)
+
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 5)
+
+        records = list(read_games(self.path))
+        self.assertEqual([actions for _, actions in records], games[:2])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
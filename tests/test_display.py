@@ -0,0 +1,79 @@
+import os
+import unittest
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+from tests.test_game import get_middle_game
+
+
+@unittest.skipIf(pygame is None, 'pygame is not installed')
+class TestBoard(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.display.init()
+
+        from display import Display
+        self.display = Display('Dala', pygame.time.Clock())
+        self.board = self.display.board
+        self.game = get_middle_game()
+
+    def tearDown(self):
+        pygame.display.quit()
+
+    def test_dirty_rects(self):
+        '''Only cells whose content changed must be redrawn'''
+        self.assertEqual(len(self.display.draw_board(self.game)), 1)
+        self.assertEqual(self.display.draw_board(self.game), [])
+
+        self.board.update_drop_candidate(self.game, (1, 1))
+        self.assertEqual(len(self.display.draw_board(self.game)), 1)
+        self.board.update_drop_candidate(self.game, (1, 1))
+        self.assertEqual(self.display.draw_board(self.game), [])
+
+        self.game.drop(0, (1, 1))
+        self.board.clear_candidates()
+        self.assertEqual(len(self.display.draw_board(self.game)), 1)
+
+        self.game.drop(1, (4, 4))
+        self.assertEqual(len(self.display.draw_board(self.game)), 1)
+
+        self.board.invalidate()
+        self.assertEqual(len(self.display.draw_board(self.game)), 1)
+
+    def test_pixels(self):
+        '''Incremental drawing must match a full redraw'''
+        self.display.draw_board(self.game)
+        self.board.update_drop_candidate(self.game, (0, 0))
+        self.display.draw_board(self.game)
+        self.game.drop(0, (0, 0))
+        self.board.clear_candidates()
+        self.display.draw_board(self.game)
+
+        incremental = pygame.image.tostring(self.board.surface, 'RGB')
+        self.board.invalidate()
+        self.display.draw_board(self.game)
+        self.assertEqual(pygame.image.tostring(self.board.surface, 'RGB'),
+                         incremental)
+
+    def test_skip_title(self):
+        '''A key press must cut the title fade short'''
+        import time
+        from display import Title
+
+        pygame.font.init()
+        clock = pygame.time.Clock()
+        start = time.time()
+        pygame.event.post(pygame.event.Event(pygame.KEYUP, key=pygame.K_a))
+        Title().draw(self.display.surface, clock)
+        self.assertLess(time.time() - start, 0.5)
+
+        start = time.time()
+        Title().draw(self.display.surface, clock, fade=False)
+        self.assertLess(time.time() - start, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,101 @@
+import unittest
+
+from bitboard import BitboardDalaGame
+from engine import Engine, TranspositionTable
+from game import DalaGame
+
+from tests.test_game import (TestDraw, get_corner_game, get_end_game,
+                              get_middle_game)
+
+
+class TestEngine(unittest.TestCase):
+    def test_finds_winning_capture(self):
+        '''Engine must take the capture that ends the game'''
+        for game_class in (DalaGame, BitboardDalaGame):
+            dgame = get_end_game(game_class)
+            dgame.move(0, (2, 4), (2, 5))
+            dgame = game_class(board=dgame.board(),
+                               remains=[0, 0],
+                               lost=[DalaGame.lost_condition - 1, 0],
+                               turn=1)
+
+            result = Engine().search(dgame, max_depth=3)
+            self.assertIsNotNone(result.action.capture)
+            self.assertEqual(result.score, Engine.win_score - 1)
+            self.assertEqual(result.pv, [result.action])
+
+            ngame = dgame.copy()
+            ngame.apply(result.action)
+            self.assertEqual(ngame.winner(), 1)
+
+    def test_does_not_mutate(self):
+        '''Searching must leave the given game untouched'''
+        dgame = get_middle_game()
+        before = dgame.copy()
+
+        result = Engine().search(dgame, max_depth=3)
+
+        self.assertEqual(dgame, before)
+        self.assertEqual(dgame.hash(), before.hash())
+        self.assertGreater(result.nodes, 0)
+        self.assertGreater(result.nodes_per_second, 0)
+
+    def test_principal_variation(self):
+        '''Principal variation must be a legal line starting at the best action'''
+        result = Engine().search(get_end_game(), max_depth=4)
+        self.assertEqual(result.pv[0], result.action)
+
+        dgame = get_end_game()
+        for action in result.pv:
+            self.assertIn(action, list(dgame.legal_actions()))
+            dgame.apply(action)
+
+    def test_time_limit(self):
+        '''An expired time limit must still return a legal action'''
+        dgame = get_middle_game()
+        result = Engine().search(dgame, max_depth=50, time_limit=0.2)
+
+        self.assertLess(result.elapsed, 2)
+        self.assertIn(result.action, list(dgame.legal_actions()))
+
+    def test_stop(self):
+        '''A stop must hold for later searches until resume()'''
+        dgame = get_middle_game()
+        engine = Engine()
+        engine.stop()
+        result = engine.search(dgame, max_depth=50)
+        self.assertEqual(result.depth, 0)
+        self.assertIn(result.action, list(dgame.legal_actions()))
+
+        engine.resume()
+        self.assertEqual(engine.search(dgame, max_depth=2).depth, 2)
+
+    def test_draws(self):
+        '''Repetitions and the no-capture limit must score as draws'''
+        dgame = get_corner_game(no_capture_limit=3)
+        result = Engine().search(dgame, max_depth=5)
+        self.assertEqual(result.score, 0)
+        self.assertIn(result.action, list(dgame.legal_actions()))
+
+        dgame = get_corner_game()
+        for action in TestDraw.shuffle * 2:
+            dgame.apply(action)
+        result = Engine().search(dgame, max_depth=3)
+        self.assertEqual((result.action, result.score), (None, 0))
+
+    def test_replacement(self):
+        '''Deeper or newer entries must replace older ones'''
+        table = TranspositionTable(4)
+        table.put(1, 3, 10, TranspositionTable.exact, None)
+        table.put(5, 1, 20, TranspositionTable.exact, None)
+        self.assertEqual(table.get(1)[2], 10)
+        self.assertIsNone(table.get(5))
+
+        table.new_search()
+        table.put(5, 1, 20, TranspositionTable.exact, None)
+        self.assertIsNone(table.get(1))
+        self.assertEqual(table.get(5)[2], 20)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
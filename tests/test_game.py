@@ -1,17 +1,20 @@
+import pickle
 import random
 import unittest
 
-from game import DalaGame
+from game import TRANSFORMS, Action, DalaGame, Rules, Status
 
 from exceptions import *
 
 
 class InitialGameSets(unittest.TestCase):
+    game_class = DalaGame
+
     def setUp(self):
-        self.empty_game = get_empty_game()
-        self.middle_game = get_middle_game()
-        self.alt_middle_game = get_alt_middle_game()
-        self.end_game = get_end_game()
+        self.empty_game = get_empty_game(self.game_class)
+        self.middle_game = get_middle_game(self.game_class)
+        self.alt_middle_game = get_alt_middle_game(self.game_class)
+        self.end_game = get_end_game(self.game_class)
 
 
 class TestWinningCondition(InitialGameSets):
@@ -29,6 +32,12 @@ class TestProgress(InitialGameSets):
 
         self.maximum_num_of_step = (expected_drops + expected_moves) * 6
 
+        # every piece dropped, then a capture at least every no_capture_limit
+        # moves until one side has lost
+        captures = 2 * (DalaGame.lost_condition - 1) + 1
+        self.maximum_num_of_actions = (num_of_pieces + (captures + 1) *
+                                       DalaGame.no_capture_limit)
+
     def test_must_end(self):
         '''Game must end'''
 
@@ -37,6 +46,8 @@ class TestProgress(InitialGameSets):
             remains = [dgame.remains(0), dgame.remains(1)]
             lost = [dgame.lost(0), dgame.lost(1)]
 
+            # successful actions, counting the one that ends the game
+            actions = 1
             try:
                 step = 0
                 now_turn = 0
@@ -65,6 +76,7 @@ class TestProgress(InitialGameSets):
                     try:
                         one_step()
                         now_turn = (now_turn + 1) % 2
+                        actions += 1
 
                     except MustCaptureException:
                         while True:
@@ -77,10 +89,11 @@ class TestProgress(InitialGameSets):
                             try:
                                 one_step()
                                 now_turn = (now_turn + 1) % 2
+                                actions += 1
                                 self.assertEqual(
                                     dgame.lost(now_turn), lost[now_turn] + 1)
                                 self.assertEqual(
-                                    dgame._board[cpos[0]][cpos[1]],
+                                    dgame.board()[cpos[0]][cpos[1]],
                                     DalaGame.empty)
                                 lost[now_turn] += 1
                                 # break out of try capture loop
@@ -91,6 +104,8 @@ class TestProgress(InitialGameSets):
                             except DalaException:
                                 continue
 
+                    except GameOverException:
+                        raise
                     except DalaException:
                         continue
 
@@ -99,6 +114,7 @@ class TestProgress(InitialGameSets):
 
             except GameOverException:
                 self.assertEqual(dgame.game_mode(), DalaGame.end_mode)
+                self.assertLessEqual(actions, self.maximum_num_of_actions)
 
             except Exception as e:
                 self.fail('unexpected Exception raised: {}!'.format(e))
@@ -300,7 +316,7 @@ class TestIllegalMoves(InitialGameSets):
                     # Legal 2nd drops
                     for k in range(DalaGame.size):
                         for l in range(DalaGame.size):
-                            if ngame._board[k][l] == DalaGame.empty:
+                            if ngame.board()[k][l] == DalaGame.empty:
                                 mgame = ngame.copy()
 
                                 try:
@@ -343,9 +359,9 @@ class TestIllegalMoves(InitialGameSets):
                             ngame.move(0, (i, j), (ni, nj))
 
                         if 0 <= ni < DalaGame.size and 0 <= nj < DalaGame.size:
-                            is_occupied = ngame._board[ni][
-                                nj] != DalaGame.empty
-                            does_not_have_piece = ngame._board[i][j] != 0
+                            board = ngame.board()
+                            is_occupied = board[ni][nj] != DalaGame.empty
+                            does_not_have_piece = board[i][j] != 0
                             does_not_move = ni == i and nj == j
                             is_too_far = (k != 0 and
                                           l != 0) or abs(k) > 1 or abs(l) > 1
@@ -386,10 +402,12 @@ class TestIllegalMoves(InitialGameSets):
 
         self.assertRaises(MustNotCaptureException, could_not_capture_on_move)
 
+        dboard = dgame.board()
+        eboard = egame.board()
         for i in range(-1, DalaGame.size + 1):
             for j in range(-1, DalaGame.size + 1):
                 out_of_scope = i < 0 or i >= DalaGame.size or j < 0 or j >= DalaGame.size
-                if out_of_scope or dgame._board[i][j] != 1:
+                if out_of_scope or dboard[i][j] != 1:
 
                     def illegal_capture():
                         dgame.drop(0, (p, q + 1), (i, j))
@@ -397,7 +415,7 @@ class TestIllegalMoves(InitialGameSets):
                     self.assertRaises(IllegalCapturePositionException,
                                       illegal_capture)
 
-                if out_of_scope or egame._board[i][j] != 0:
+                if out_of_scope or eboard[i][j] != 0:
 
                     def illegal_capture_on_move():
                         egame.move(1, (2, 3), (2, 4), (i, j))
@@ -406,37 +424,518 @@ class TestIllegalMoves(InitialGameSets):
                                       illegal_capture_on_move)
 
 
-def get_empty_game():
-    return DalaGame()
+class TestLegalActions(InitialGameSets):
+    def test_matches_exceptions(self):
+        '''Generated actions must be exactly those drop/move accept'''
+        egame = self.end_game.copy()
+        egame.move(0, (2, 4), (2, 5))
+
+        for dgame in (self.empty_game, self.middle_game, self.alt_middle_game,
+                      self.end_game, egame):
+            actions = list(dgame.legal_actions())
+            self.assertEqual(len(actions), len(set(actions)))
+            self.assertEqual(set(actions), brute_force_actions(dgame))
+
+    def test_random_games(self):
+        '''Games played from generated actions must not raise'''
+        for _ in range(5):
+            dgame = self.empty_game.copy()
+
+            for _ in range(1000):
+                actions = list(dgame.legal_actions())
+                if not actions:
+                    break
+
+                try:
+                    play(dgame, random.choice(actions))
+                except GameOverException:
+                    self.assertEqual(list(dgame.legal_actions()), [])
+                    break
+
+
+class TestCheck(InitialGameSets):
+    def test_matches_exceptions(self):
+        '''check_* must agree with the exceptions of drop/move'''
+        egame = self.end_game.copy()
+        egame.move(0, (2, 4), (2, 5))
+
+        positions = [(-1, 0), (2, 6), (1, 1), (2, 2), (2, 3), (2, 4), (3, 3)]
+        for dgame in (self.empty_game, self.middle_game, self.end_game,
+                      egame):
+            for player in (0, 1):
+                for pos in positions:
+                    for cpos in [None] + positions:
+                        self.assertStatus(dgame, 'drop', player, pos, cpos)
+                        for dpos in positions:
+                            self.assertStatus(dgame, 'move', player, pos,
+                                              dpos, cpos)
+
+    def test_try(self):
+        '''try_* must play legal actions only and never raise'''
+        dgame = self.middle_game.copy()
+        before = snapshot(dgame)
+
+        self.assertEqual(dgame.try_drop(0, (2, 4)), Status.MUST_CAPTURE)
+        self.assertEqual(dgame.try_move(0, (2, 2), (1, 2)),
+                         Status.MUST_DROP_FIRST)
+        self.assertEqual(snapshot(dgame), before)
+
+        self.assertEqual(dgame.try_drop(0, (2, 4), (3, 3)), Status.OK)
+        self.assertEqual(dgame.whos_turn(), 1)
+        self.assertEqual(dgame.lost(1), 1)
+        self.assertEqual(dgame.try_move(1, (3, 2), (3, 1)),
+                         Status.MUST_DROP_FIRST)
+
+    def assertStatus(self, dgame, name, *args):
+        before = snapshot(dgame)
+        status = getattr(dgame, 'check_' + name)(*args)
+        self.assertEqual(snapshot(dgame), before)
+
+        ngame = dgame.copy()
+        try:
+            getattr(ngame, name)(*args)
+        except GameOverException:
+            self.assertEqual(status, Status.OK)
+        except DalaException as e:
+            self.assertNotEqual(status, Status.OK)
+            self.assertIs(type(status.exception((0, 0))), type(e))
+        else:
+            self.assertEqual(status, Status.OK)
+
+
+class TestApplyUndo(InitialGameSets):
+    def test_round_trip(self):
+        '''undo must restore the exact state before each apply'''
+        for _ in range(5):
+            dgame = self.empty_game.copy()
+            states = []
+
+            for _ in range(1000):
+                actions = list(dgame.legal_actions())
+                if not actions:
+                    break
+
+                action = random.choice(actions)
+                states.append(snapshot(dgame))
+
+                ngame = dgame.copy()
+                try:
+                    play(ngame, action)
+                except GameOverException:
+                    pass
+
+                dgame.apply(action)
+                self.assertEqual(snapshot(dgame), snapshot(ngame))
+
+            while states:
+                dgame.undo()
+                self.assertEqual(snapshot(dgame), states.pop())
+
+    def test_undo_move(self):
+        '''undo must also revert move'''
+        dgame = self.end_game.copy()
+        before = snapshot(dgame)
+
+        dgame.move(0, (2, 4), (2, 5))
+        dgame.move(1, (2, 3), (2, 4), (3, 3))
+        dgame.undo()
+        dgame.undo()
+
+        self.assertEqual(snapshot(dgame), before)
+
+
+class TestHash(InitialGameSets):
+    def test_incremental(self):
+        '''Incremental hash must match a hash computed from scratch'''
+        for _ in range(5):
+            dgame = self.empty_game.copy()
+            hashes = []
+
+            for _ in range(1000):
+                actions = list(dgame.legal_actions())
+                if not actions:
+                    break
+
+                hashes.append(dgame.hash())
+                dgame.apply(random.choice(actions))
+
+                fresh = DalaGame(board=dgame.board(),
+                                 remains=[dgame.remains(0), dgame.remains(1)],
+                                 lost=[dgame.lost(0), dgame.lost(1)],
+                                 turn=dgame.whos_turn())
+                self.assertEqual(dgame, fresh)
+                self.assertEqual(dgame.hash(), fresh.hash())
+                self.assertEqual(hash(dgame), hash(fresh))
+
+            while hashes:
+                dgame.undo()
+                self.assertEqual(dgame.hash(), hashes.pop())
+
+    def test_distinct(self):
+        '''Different positions should get different hashes'''
+        games = [self.empty_game, self.middle_game, self.alt_middle_game,
+                 self.end_game]
+        self.assertEqual(len(set(g.hash() for g in games)), len(games))
+
+        dgame = self.middle_game.copy()
+        dgame.drop(0, (1, 1))
+        self.assertNotEqual(dgame.hash(), self.middle_game.hash())
+        self.assertEqual(len({self.middle_game, dgame,
+                              self.middle_game.copy()}), 2)
+
+
+class TestMobility(InitialGameSets):
+    def test_incremental(self):
+        '''Incremental mobility must match a count from scratch'''
+        for _ in range(5):
+            dgame = self.empty_game.copy()
+            counts = []
+
+            for _ in range(1000):
+                actions = list(dgame.legal_actions())
+                if not actions:
+                    break
+
+                counts.append((dgame.mobility(0), dgame.mobility(1)))
+                dgame.apply(random.choice(actions))
+                self.assertEqual([dgame.mobility(0), dgame.mobility(1)],
+                                 count_mobility(dgame))
+                self.assertEqual(
+                    [dgame.mobility(0), dgame.mobility(1)],
+                    [dgame.copy().mobility(0), dgame.copy().mobility(1)])
+
+            while counts:
+                dgame.undo()
+                self.assertEqual((dgame.mobility(0), dgame.mobility(1)),
+                                 counts.pop())
+
+    def test_immobile(self):
+        '''A player who cannot move loses'''
+        _ = DalaGame.empty
+        board = [
+            [1, 1, 0, _, _, _],
+            [1, 0, _, _, _, _],
+            [_, _, _, _, _, _],
+            [0, _, _, _, _, _],
+            [_, _, _, _, _, _],
+            [_, _, _, _, _, _]
+        ] # yapf: disable
+        dgame = self.game_class(board=board, remains=[0, 0], lost=[9, 9])
+        self.assertIsNone(dgame.winner())
+        self.assertEqual(dgame.mobility(1), 1)
+
+        ngame = dgame.copy()
+        ngame.apply(Action((3, 0), (2, 0), None))
+        self.assertEqual(ngame.mobility(1), 0)
+        self.assertEqual(ngame.winner(), 0)
+        self.assertEqual(ngame.game_mode(), DalaGame.end_mode)
+        self.assertEqual(list(ngame.legal_actions()), [])
+
+        ngame.undo()
+        self.assertEqual(ngame, dgame)
+        self.assertIsNone(ngame.winner())
+
+        def move():
+            dgame.move(0, (3, 0), (2, 0))
+
+        self.assertRaises(GameOverException, move)
+        self.assertEqual(dgame.winner(), 0)
+
+        board[3][0] = _
+        board[2][0] = 0
+        sgame = self.game_class(board=board, remains=[0, 0], lost=[9, 9],
+                                turn=1)
+        self.assertEqual(sgame.winner(), 0)
+
+
+class TestDraw(InitialGameSets):
+    shuffle = [
+        Action((0, 0), (0, 1), None),
+        Action((5, 5), (5, 4), None),
+        Action((0, 1), (0, 0), None),
+        Action((5, 4), (5, 5), None)
+    ]
+
+    def get_corner_game(self, **kwargs):
+        return get_corner_game(self.game_class, **kwargs)
+
+    def test_repetition(self):
+        '''The third occurrence of a position must draw'''
+        dgame = self.get_corner_game()
+        self.assertEqual(dgame.repetitions(), 1)
+
+        for action in self.shuffle * 2:
+            self.assertFalse(dgame.draw())
+            dgame.apply(action)
+        self.assertEqual(dgame.repetitions(), 0)
+        self.assertTrue(dgame.draw())
+        self.assertIsNone(dgame.winner())
+        self.assertEqual(dgame.game_mode(), DalaGame.end_mode)
+        self.assertEqual(list(dgame.legal_actions()), [])
+
+        dgame.undo()
+        self.assertFalse(dgame.draw())
+        self.assertEqual(dgame.whos_turn(), 1)
+        for _ in range(3):
+            dgame.undo()
+        self.assertEqual(dgame.repetitions(), 2)
+
+        ngame = dgame.copy()
+        for action in self.shuffle[:3]:
+            play(ngame, action)
+        self.assertRaises(GameOverException, play, ngame, self.shuffle[3])
+        self.assertTrue(ngame.draw())
+
+    def test_no_capture_limit(self):
+        '''Moves without a capture must draw at the limit'''
+        dgame = self.get_corner_game(repetition_limit=0, no_capture_limit=6)
+        for action in (self.shuffle * 2)[:5]:
+            dgame.apply(action)
+        self.assertFalse(dgame.draw())
+
+        ngame = dgame.copy()
+        ngame.apply(self.shuffle[1])
+        self.assertTrue(ngame.draw())
+
+        ngame = self.get_corner_game(repetition_limit=0, no_capture_limit=0)
+        for action in self.shuffle * 10:
+            ngame.apply(action)
+        self.assertFalse(ngame.draw())
+
+    def test_capture_resets(self):
+        '''Drops and captures must start the count again'''
+        dgame = self.end_game.copy()
+        for source, destination in (((2, 4), (2, 5)), ((0, 4), (0, 5)),
+                                    ((2, 5), (2, 4)), ((0, 5), (0, 4)),
+                                    ((2, 4), (2, 5))):
+            play(dgame, Action(source, destination, None))
+        self.assertEqual(dgame.repetitions(), 2)
+        self.assertEqual(dgame.quiet_moves(), 5)
+
+        dgame.move(1, (2, 3), (2, 4), (3, 3))
+        self.assertEqual(dgame.repetitions(), 1)
+        self.assertEqual(dgame.quiet_moves(), 0)
+
+        dgame.undo()
+        self.assertEqual(dgame.repetitions(), 2)
+        self.assertEqual(dgame.quiet_moves(), 5)
+
+        ngame = self.get_corner_game(no_capture_limit=2)
+        ngame.apply(self.shuffle[0])
+        self.assertEqual(ngame.quiet_moves(), 1)
+        self.assertEqual(ngame.copy().quiet_moves(), 1)
+
+
+class TestSymmetry(InitialGameSets):
+    def test_canonical(self):
+        '''All symmetric forms must share one canonical game'''
+        egame = self.end_game.copy()
+        egame.move(0, (2, 4), (2, 5))
+
+        for dgame in (self.empty_game, self.middle_game, self.end_game,
+                      egame):
+            canonical, transform = dgame.canonical()
+            self.assertIsInstance(canonical, self.game_class)
+
+            for other in TRANSFORMS:
+                ngame = transformed(dgame, other)
+                self.assertEqual(ngame.canonical()[0], canonical)
 
+            self.assertEqual(transformed(dgame, transform), canonical)
 
-def get_middle_game():
-    middle_game = DalaGame()
+    def test_actions(self):
+        '''Transforms must map legal actions onto legal actions'''
+        egame = self.end_game.copy()
+        egame.move(0, (2, 4), (2, 5))
+
+        for dgame in (self.middle_game, egame):
+            actions = set(dgame.legal_actions())
+
+            for transform in TRANSFORMS:
+                ngame = transformed(dgame, transform)
+                mapped = {transform.action(a) for a in actions}
+                self.assertEqual(mapped, set(ngame.legal_actions()))
+                self.assertEqual(
+                    {transform.inverse_action(a) for a in mapped}, actions)
+
+
+class TestRules(unittest.TestCase):
+    game_class = DalaGame
+
+    def test_shared(self):
+        '''Rules must be built once per configuration and survive pickling'''
+        rules = Rules.get(5, 8)
+        self.assertIs(Rules.get(5, 8), rules)
+        self.assertIs(pickle.loads(pickle.dumps(rules)), rules)
+        self.assertIs(Rules.get(), DalaGame.rules)
+        self.assertIsNot(Rules.get(5, 8, lost_condition=5), rules)
+
+        dgame = self.game_class(rules=rules)
+        self.assertIs(dgame.copy().rules, rules)
+        self.assertIs(pickle.loads(pickle.dumps(dgame)).rules, rules)
+        self.assertNotEqual(dgame, self.game_class())
+        self.assertNotEqual(dgame.hash(), self.game_class().hash())
+
+        for args in ((2, 1), (4, 8), (5, 8, 0), (5, 8, 6, 5)):
+            with self.assertRaises(ValueError):
+                Rules.get(*args)
+
+    def test_mixed_sizes(self):
+        '''A 5x5 and an 8x8 game must be played side by side'''
+        rng = random.Random(25)
+        games = [self.game_class(rules=Rules.get(5, 8)),
+                 self.game_class(rules=Rules.get(8, 16))]
+
+        with self.assertRaises(IllegalPositionException):
+            games[0].drop(0, (5, 5))
+        for dgame in games:
+            self.assertEqual(dgame.remains(0), dgame.num_of_pieces)
+            self.assertEqual(set(dgame.legal_actions()),
+                             brute_force_actions(dgame))
+
+        plies = [[], []]
+        for _ in range(300):
+            for dgame, actions in zip(games, plies):
+                if dgame.game_mode() == DalaGame.end_mode:
+                    continue
+                action = rng.choice(list(dgame.legal_actions()))
+                dgame.apply(action)
+                actions.append(action)
+
+                ngame = self.game_class(board=dgame.board(),
+                                        remains=[dgame.remains(0),
+                                                 dgame.remains(1)],
+                                        lost=[dgame.lost(0), dgame.lost(1)],
+                                        turn=dgame.whos_turn(),
+                                        winner=dgame.winner(),
+                                        rules=dgame.rules)
+                self.assertEqual(ngame.hash(), dgame.hash())
+                self.assertEqual(count_mobility(ngame), count_mobility(dgame))
+
+        for dgame, actions in zip(games, plies):
+            self.assertGreater(len(actions), 2 * dgame.num_of_pieces)
+            for action in reversed(actions):
+                dgame.undo()
+            self.assertEqual(dgame, self.game_class(rules=dgame.rules))
+
+        self.assertEqual(self.game_class().size, 6)
+
+
+def transformed(dgame, transform):
+    board = dgame.board()
+    nboard = DalaGame().board()
+    for r in range(DalaGame.size):
+        for c in range(DalaGame.size):
+            nr, nc = transform.position((r, c))
+            nboard[nr][nc] = board[r][c]
+
+    return dgame.__class__(board=nboard,
+                           remains=[dgame.remains(0), dgame.remains(1)],
+                           lost=[dgame.lost(0), dgame.lost(1)],
+                           turn=dgame.whos_turn())
+
+
+def count_mobility(dgame):
+    board = dgame.board()
+    size = dgame.size
+    mobility = [0, 0]
+    for r in range(size):
+        for c in range(size):
+            if board[r][c] == DalaGame.empty:
+                continue
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if (0 <= nr < size and 0 <= nc < size and
+                        board[nr][nc] == DalaGame.empty):
+                    mobility[board[r][c]] += 1
+    return mobility
+
+
+def snapshot(dgame):
+    return (dgame.board(), dgame.remains(0), dgame.remains(1), dgame.lost(0),
+            dgame.lost(1), dgame.whos_turn(), dgame.winner(),
+            dgame.repetitions())
+
+
+def brute_force_actions(dgame):
+    player = dgame.whos_turn()
+    positions = [(i, j) for i in range(dgame.size) for j in range(dgame.size)]
+    candidates = []
+
+    if dgame.game_mode() == DalaGame.drop_mode:
+        for pos in positions:
+            for cpos in [None] + positions:
+                candidates.append(Action(None, pos, cpos))
+
+    elif dgame.game_mode() == DalaGame.move_mode:
+        for pos in positions:
+            for dpos in positions:
+                for cpos in [None] + positions:
+                    candidates.append(Action(pos, dpos, cpos))
+
+    actions = set()
+    for action in candidates:
+        ngame = dgame.copy()
+        try:
+            play(ngame, action)
+        except GameOverException:
+            pass
+        except DalaException:
+            continue
+        actions.add(action)
+
+    return actions
+
+
+def play(dgame, action):
+    source, destination, capture = action
+    if source is None:
+        dgame.drop(dgame.whos_turn(), destination, capture)
+    else:
+        dgame.move(dgame.whos_turn(), source, destination, capture)
+
+
+def get_empty_game(game_class=DalaGame):
+    return game_class()
+
+
+def get_middle_game(game_class=DalaGame):
+    board = DalaGame().board()
     q = DalaGame.size // 2
     p = q - 1
-    middle_game._board[p][p] = 0
-    middle_game._board[p][q] = 0
-    middle_game._board[q][p] = 1
-    middle_game._board[q][q] = 1
-    middle_game._remains = [DalaGame.initial_condition,
-                            DalaGame.initial_condition]
+    board[p][p] = 0
+    board[p][q] = 0
+    board[q][p] = 1
+    board[q][q] = 1
+    middle_game = game_class(board=board,
+                             remains=[DalaGame.initial_condition,
+                                      DalaGame.initial_condition])
     return middle_game
 
 
-def get_alt_middle_game():
-    middle_game = DalaGame()
+def get_alt_middle_game(game_class=DalaGame):
+    board = DalaGame().board()
     q = DalaGame.size // 2
     p = q - 1
-    middle_game._board[p][p] = 0
-    middle_game._board[q][q] = 0
-    middle_game._board[q][p] = 1
-    middle_game._board[p][q] = 1
-    middle_game._remains = [DalaGame.initial_condition,
-                            DalaGame.initial_condition]
+    board[p][p] = 0
+    board[q][q] = 0
+    board[q][p] = 1
+    board[p][q] = 1
+    middle_game = game_class(board=board,
+                             remains=[DalaGame.initial_condition,
+                                      DalaGame.initial_condition])
     return middle_game
 
 
-def get_end_game():
+def get_corner_game(game_class=DalaGame, **kwargs):
+    '''one piece each in opposite corners, free to shuffle forever'''
+    _ = DalaGame.empty
+    board = [[_] * DalaGame.size for i in range(DalaGame.size)]
+    board[0][0] = 0
+    board[5][5] = 1
+    return game_class(board=board, remains=[0, 0], lost=[9, 9], **kwargs)
+
+
+def get_end_game(game_class=DalaGame):
     _ = DalaGame.empty
 
     board = [
@@ -448,7 +947,7 @@ def get_end_game():
         [_, 1, 0, 1, _, _]
     ] # yapf: disable
 
-    end_game = DalaGame(board=board, remains=[0, 0])
+    end_game = game_class(board=board, remains=[0, 0])
 
     return end_game
 
@@ -0,0 +1,90 @@
+import threading
+import unittest
+
+import instrument
+from bitboard import BitboardDalaGame
+from engine import Engine
+from exceptions import CentralNotOccupiedException
+from game import DalaGame
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        instrument.REGISTRY.reset()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.REGISTRY.reset()
+
+    def test_disabled(self):
+        '''Disabled instrumentation must leave the methods untouched'''
+        drop = DalaGame.drop
+        instrument.enable()
+        self.assertIsNot(DalaGame.drop, drop)
+        instrument.disable()
+        self.assertIs(DalaGame.drop, drop)
+
+        DalaGame().drop(0, (2, 2))
+        self.assertEqual(instrument.REGISTRY.snapshot(), ({}, {}))
+
+    def test_counts(self):
+        '''Calls and raised exceptions must be counted by name'''
+        instrument.enable()
+        dgame = DalaGame()
+        dgame.drop(0, (2, 2))
+        with self.assertRaises(CentralNotOccupiedException):
+            dgame.drop(1, (0, 0))
+        dgame.copy()
+
+        stats, _ = instrument.REGISTRY.snapshot()
+        self.assertEqual(stats['game.drop'][0], 2)
+        self.assertEqual(stats['game.copy'][0], 1)
+        self.assertEqual(stats['raise.CentralNotOccupiedException'][0], 1)
+        self.assertGreater(stats['game.drop'][1], 0)
+
+    def test_subclass(self):
+        '''Overridden methods of subclasses must be timed too'''
+        instrument.enable()
+        BitboardDalaGame().copy()
+        stats, _ = instrument.REGISTRY.snapshot()
+        self.assertEqual(stats['game.copy'][0], 1)
+
+    def test_scope(self):
+        '''A scope must only see what was recorded inside it'''
+        instrument.enable()
+        DalaGame().copy()
+        with instrument.scope() as outer:
+            DalaGame().copy()
+            with instrument.scope() as inner:
+                Engine().search(DalaGame(), max_depth=2)
+
+        self.assertEqual(outer.snapshot()[0]['game.copy'][0],
+                         1 + inner.snapshot()[0]['game.copy'][0])
+        self.assertGreater(inner.snapshot()[0]['engine.nodes'][0], 0)
+        self.assertEqual(instrument.REGISTRY.snapshot()[0]['game.copy'][0],
+                         1 + outer.snapshot()[0]['game.copy'][0])
+
+    def test_threads(self):
+        '''Scopes must not leak into other threads'''
+        instrument.enable()
+        with instrument.scope() as stats:
+            thread = threading.Thread(target=DalaGame().copy)
+            thread.start()
+            thread.join()
+        self.assertNotIn('game.copy', stats.snapshot()[0])
+
+    def test_prometheus(self):
+        registry = instrument.Registry()
+        registry.add('game.drop', 0.5)
+        registry.add('game.drop', 0.25)
+        registry.gauge('server.sessions', 3)
+        text = registry.prometheus()
+
+        self.assertIn('# TYPE dala_count_total counter', text)
+        self.assertIn('dala_count_total{name="game.drop"} 2', text)
+        self.assertIn('dala_seconds_total{name="game.drop"} 0.75', text)
+        self.assertIn('dala_gauge{name="server.sessions"} 3', text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
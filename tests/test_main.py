@@ -0,0 +1,184 @@
+import os
+import subprocess
+import sys
+import threading
+import unittest
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, 'pygame is not installed')
+class TestEventLoop(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+        import main
+        self.main = main
+        self.dala = main.Dala(fps=1000, fade=False)
+
+        self.updates = 0
+        update = self.dala.display.update
+
+        def counted_update(game):
+            self.updates += 1
+            update(game)
+
+        self.dala.display.update = counted_update
+
+    def tearDown(self):
+        pygame.quit()
+
+    def post(self, event_type, **attributes):
+        pygame.event.post(pygame.event.Event(event_type, **attributes))
+
+    def at(self, r, c):
+        from display import Board, Display
+        return (Display.board_x + Board.step_size * c + 10,
+                Display.board_y + Board.step_size * r + 10)
+
+    def test_coalesce(self):
+        '''Motion bursts must be handled once per batch and clicks kept'''
+        for i in range(300):
+            self.post(pygame.MOUSEMOTION, pos=self.at(i % 6, 2), rel=(0, 0),
+                      buttons=(0, 0, 0))
+        self.post(pygame.MOUSEBUTTONUP, pos=self.at(2, 2), button=1)
+        self.post(pygame.KEYUP, key=pygame.K_ESCAPE)
+
+        self.assertRaises(self.main.QuitException, self.dala.main)
+        self.assertEqual(self.updates, 1)
+        self.assertEqual(self.dala.game.board()[2][2], 0)
+
+    def test_same_cell(self):
+        '''Motion inside the hovered cell must not cause a redraw'''
+        x, y = self.at(3, 3)
+        pygame.event.clear()
+        self.post(pygame.MOUSEMOTION, pos=(x, y), rel=(0, 0), buttons=(0, 0, 0))
+        self.dala._update_display()
+        event = self.dala._next_event()
+        self.assertEqual(event.type, pygame.MOUSEMOTION)
+        self.dala._update_display()
+
+        for i in range(5):
+            self.post(pygame.MOUSEMOTION, pos=(x + i, y), rel=(0, 0),
+                      buttons=(0, 0, 0))
+            self.post(pygame.KEYUP, key=pygame.K_a)
+
+        self.updates = 0
+        for i in range(5):
+            self.assertEqual(self.dala._next_event().type, pygame.KEYUP)
+        self.assertEqual(self.updates, 0)
+
+
+class SlowPlayer(object):
+    '''a player whose search runs until stopped'''
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        self.pondered = threading.Event()
+
+    def best_action(self, game):
+        self.stopped.wait(5)
+        self.stopped.clear()
+        return next(iter(game.legal_actions()))
+
+    def ponder(self, game):
+        self.pondered.set()
+
+    def stop(self):
+        self.stopped.set()
+
+
+@unittest.skipIf(pygame is None, 'pygame is not installed')
+class TestAIWorker(unittest.TestCase):
+    def test_cancel(self):
+        '''Superseded requests must be stopped and never posted'''
+        from game import DalaGame
+        from main import AIWorker
+
+        posted = []
+        done = threading.Event()
+
+        def post(request, action):
+            posted.append((request, action))
+            done.set()
+
+        player = SlowPlayer()
+        worker = AIWorker(player, post)
+        first = worker.think(DalaGame())
+        second = worker.think(DalaGame())
+        player.stop()
+        self.assertTrue(done.wait(5))
+
+        worker.ponder(DalaGame())
+        self.assertTrue(player.pondered.wait(5))
+        worker.close()
+        self.assertNotEqual(first, second)
+        self.assertEqual([request for request, _ in posted], [second])
+
+    def test_game(self):
+        '''The computer must answer through events without blocking'''
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        import main
+        from tournament import RandomPlayer
+
+        dala = main.Dala(fps=1000, players={1: RandomPlayer(1)}, fade=False)
+        post = dala.workers[1]._post
+
+        def post_then_quit(request, action):
+            post(request, action)
+            pygame.event.post(
+                pygame.event.Event(pygame.KEYUP, key=pygame.K_ESCAPE))
+
+        dala.workers[1]._post = post_then_quit
+
+        from display import Board, Display
+        pygame.event.post(
+            pygame.event.Event(pygame.MOUSEBUTTONUP,
+                               pos=(Display.board_x + Board.step_size * 2 + 10,
+                                    Display.board_y + Board.step_size * 2 +
+                                    10),
+                               button=1))
+
+        try:
+            self.assertRaises(main.QuitException, dala.main)
+        finally:
+            dala.close()
+            pygame.quit()
+
+        self.assertEqual(dala.game.remains(0), 11)
+        self.assertEqual(dala.game.remains(1), 11)
+        self.assertEqual(dala.state, main.Dala.choosing)
+
+
+class TestHeadless(unittest.TestCase):
+    def test_no_pygame(self):
+        '''Headless games and the command line tools must not load pygame'''
+        code = '''
+import sys
+import book, engine, loadtest, main, perft, server, tablebase, tournament
+game = main.Dala(headless=True, players={
+    0: tournament.RandomPlayer(1), 1: tournament.RandomPlayer(2)})
+try:
+    game.main()
+except main.GameOverException:
+    pass
+assert game.game.winner() is not None
+assert 'pygame' not in sys.modules
+'''
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.check_call([sys.executable, '-c', code], cwd=root)
+
+    def test_players(self):
+        '''A headless game needs a bot for each side'''
+        import main
+        from tournament import RandomPlayer
+
+        dala = main.Dala(headless=True, players={0: RandomPlayer()})
+        self.assertRaises(ValueError, dala.main)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
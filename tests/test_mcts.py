@@ -0,0 +1,89 @@
+import random
+import unittest
+
+from game import DalaGame
+from mcts import MCTSPlayer, random_playout
+
+from tests.test_game import get_end_game, get_middle_game
+
+
+def get_winning_game():
+    dgame = get_end_game()
+    dgame.move(0, (2, 4), (2, 5))
+    return DalaGame(board=dgame.board(),
+                    remains=[0, 0],
+                    lost=[DalaGame.lost_condition - 1, 0],
+                    turn=1)
+
+
+class TestMCTS(unittest.TestCase):
+    def test_playout_restores(self):
+        '''Random playouts must leave the game untouched'''
+        rng = random.Random(1)
+        for dgame in (DalaGame(), get_middle_game(), get_end_game()):
+            before = dgame.copy()
+            for _ in range(10):
+                winner = random_playout(dgame, rng, limit=500)
+                self.assertIn(winner, (0, 1, None))
+                self.assertEqual(dgame, before)
+
+    def test_finds_winning_capture(self):
+        '''MCTS must take the capture that ends the game'''
+        dgame = get_winning_game()
+        action = MCTSPlayer(iterations=300, seed=1).best_action(dgame)
+
+        dgame.apply(action)
+        self.assertEqual(dgame.winner(), 1)
+
+    def test_root_parallel(self):
+        '''Visit counts from several workers must be merged'''
+        dgame = get_middle_game()
+        player = MCTSPlayer(iterations=50, workers=2, seed=1)
+        try:
+            stats = player.search(dgame)
+            executor = player._executor
+            self.assertEqual(player.search(dgame), stats)
+            self.assertIs(player._executor, executor)
+        finally:
+            player.close()
+        self.assertIsNone(player._executor)
+
+        self.assertEqual(sum(visits for visits, _ in stats.values()), 100)
+        self.assertLessEqual(set(stats), set(dgame.legal_actions()))
+
+    def test_stop(self):
+        '''A stop must hold for later searches until resume()'''
+        dgame = get_middle_game()
+        for workers in (1, 2):
+            player = MCTSPlayer(iterations=20, workers=workers, seed=1)
+            try:
+                player.stop()
+                self.assertEqual(player.search(dgame), {})
+                self.assertIsNone(player.best_action(dgame))
+
+                player.resume()
+                stats = player.search(dgame)
+                self.assertEqual(sum(v for v, _ in stats.values()),
+                                 20 * workers)
+            finally:
+                player.close()
+
+    def test_executor(self):
+        '''A given executor must be used and left open'''
+        import concurrent.futures
+
+        dgame = get_middle_game()
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            player = MCTSPlayer(iterations=20,
+                                workers=2,
+                                seed=1,
+                                executor=executor)
+            stats = player.search(dgame)
+            player.close()
+            self.assertEqual(executor.submit(len, 'ab').result(), 2)
+
+        self.assertEqual(sum(visits for visits, _ in stats.values()), 40)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,34 @@
+import unittest
+
+from perft import (BACKENDS, perft, perft_copy, regressions,
+                   standard_positions)
+
+
+class TestPerft(unittest.TestCase):
+    def test_standard_counts(self):
+        '''Node counts must match the recorded ones'''
+        for name, (game, depth, expected) in standard_positions(
+                BACKENDS['bitboard']).items():
+            before = game.copy()
+            self.assertEqual(perft(game, depth), expected, msg=name)
+            self.assertEqual(game, before)
+
+    def test_methods_agree(self):
+        '''Every backend and method must count the same sequences'''
+        for name in standard_positions():
+            counts = set()
+            for game_class in BACKENDS.values():
+                game, depth, _ = standard_positions(game_class)[name]
+                counts.add(perft(game, depth - 1))
+                counts.add(perft_copy(game, depth - 1))
+            self.assertEqual(len(counts), 1, msg=name)
+
+    def test_regressions(self):
+        '''Only speeds below the threshold must be reported'''
+        baseline = {'a': 100.0, 'b': 100.0, 'c': 100.0}
+        results = {'a': 85.0, 'b': 79.0, 'c': 150.0, 'd': 1.0}
+        self.assertEqual(regressions(results, baseline, 0.2), ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import instrument
+import loadtest
+from game import DalaGame
+from server import DalaServer, game_from_state
+
+from tests.test_game import get_middle_game
+
+
+class Client(object):
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, **message):
+        self.writer.write(json.dumps(message).encode() + b'\n')
+        return await self.receive()
+
+    async def receive(self):
+        return json.loads(await asyncio.wait_for(self.reader.readline(), 5))
+
+    def close(self):
+        self.writer.close()
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = DalaServer(max_sessions=2)
+        sockets = (await self.server.start(port=0)).sockets
+        self.port = sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def connect(self):
+        return Client(*await asyncio.open_connection('127.0.0.1', self.port))
+
+    async def test_two_players(self):
+        '''Seats must take turns and see each other's actions'''
+        first = await self.connect()
+        second = await self.connect()
+
+        reply = await first.request(op='join', id=7)
+        self.assertTrue(reply['ok'])
+        self.assertEqual((reply['player'], reply['id']), (0, 7))
+        self.assertEqual(game_from_state(reply['state']), DalaGame())
+
+        reply = await second.request(op='join', game=reply['game'])
+        self.assertEqual(reply['player'], 1)
+
+        reply = await second.request(op='drop', position=[2, 2])
+        self.assertEqual(reply['error'], 'NOT_YOUR_TURN')
+
+        reply = await first.request(op='drop', position=[2, 2])
+        self.assertTrue(reply['ok'])
+        self.assertEqual(reply['state']['turn'], 1)
+
+        update = await second.receive()
+        self.assertEqual(update['event'], 'update')
+        self.assertEqual(update['state']['board'][2][2], 0)
+
+        self.assertTrue((await second.request(op='drop',
+                                              position=[2, 3]))['ok'])
+        self.assertEqual((await first.receive())['state']['turn'], 0)
+
+        reply = await first.request(op='move', source=[2, 2],
+                                    destination=[1, 2])
+        self.assertEqual(reply['error'], 'MUST_DROP_FIRST')
+
+        await first.request(op='leave')
+        self.assertEqual((await second.receive())['event'], 'left')
+
+        first.close()
+        second.close()
+
+    async def test_capture(self):
+        '''A drop that captures may name its capture afterwards'''
+        client = await self.connect()
+        reply = await client.request(op='join', solo=True)
+        self.server.sessions[reply['game']].game = get_middle_game()
+
+        reply = await client.request(op='drop', position=[2, 4])
+        self.assertEqual(reply['error'], 'MUST_CAPTURE')
+        reply = await client.request(op='capture', position=[2, 2])
+        self.assertEqual(reply['error'], 'NO_PIECE_TO_CAPTURE')
+
+        reply = await client.request(op='capture', position=[3, 3])
+        self.assertTrue(reply['ok'])
+        self.assertEqual(reply['state']['lost'], [0, 1])
+
+        reply = await client.request(op='capture', position=[3, 2])
+        self.assertEqual(reply['error'], 'NOTHING_TO_CAPTURE')
+        client.close()
+
+    async def test_errors(self):
+        '''Malformed requests must get an error reply'''
+        client = await self.connect()
+        for line, error in ((b'nonsense', 'BAD_REQUEST'),
+                            (b'[1]', 'BAD_REQUEST'),
+                            (b'{"op": "fly"}', 'UNKNOWN_OP'),
+                            (b'{"op": "state"}', 'NOT_JOINED'),
+                            (b'{"op": "join", "game": 99}', 'UNKNOWN_GAME')):
+            client.writer.write(line + b'\n')
+            self.assertEqual((await client.receive())['error'], error)
+
+        await client.request(op='join')
+        reply = await client.request(op='drop', position=['a', 1])
+        self.assertEqual(reply['error'], 'BAD_REQUEST')
+        reply = await client.request(op='drop')
+        self.assertEqual(reply['error'], 'BAD_REQUEST')
+        client.close()
+
+    async def test_sessions(self):
+        '''Sessions must be limited and reaped when idle'''
+        clients = [await self.connect() for _ in range(3)]
+        replies = [await c.request(op='join') for c in clients]
+        self.assertEqual([r['ok'] for r in replies], [True, True, False])
+        self.assertEqual(replies[2]['error'], 'SERVER_FULL')
+
+        self.server.reap(self.server.sessions[replies[0]['game']].last_active +
+                         self.server.idle_timeout + 1)
+        self.assertEqual(len(self.server.sessions), 0)
+        for client in clients[:2]:
+            self.assertEqual((await client.receive())['event'], 'closed')
+        self.assertEqual((await clients[0].request(op='state'))['error'],
+                         'NOT_JOINED')
+        self.assertTrue((await clients[2].request(op='join'))['ok'])
+
+        for client in clients:
+            client.close()
+
+    async def test_instrument(self):
+        '''Requests and errors must feed the instrument registry'''
+        instrument.enable()
+        instrument.REGISTRY.reset()
+        try:
+            client = await self.connect()
+            await client.request(op='join')
+            await client.request(op='drop', position=[0, 0])
+            client.close()
+
+            stats, gauges = instrument.REGISTRY.snapshot()
+            self.assertEqual(stats['server.request'][0], 2)
+            self.assertEqual(stats['server.error.CENTRAL_NOT_OCCUPIED'][0],
+                             1)
+            self.assertEqual(gauges['server.sessions'], 1)
+        finally:
+            instrument.disable()
+            instrument.REGISTRY.reset()
+
+
+class TestLoadTest(unittest.IsolatedAsyncioTestCase):
+    async def test_unix_socket(self):
+        '''The load test must play complete games over a Unix socket'''
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'dala.sock')
+            server = DalaServer()
+            await server.start(path=path)
+
+            result = await loadtest.run(path=path, clients=4, games=2)
+            self.assertEqual(result.errors, 0)
+            self.assertEqual(result.games, 8)
+            self.assertGreater(len(result.latencies), 8 * 20)
+            self.assertLessEqual(result.percentile(50),
+                                 result.percentile(100))
+            self.assertIn('p99', result.report())
+
+            await server.close()
+            self.assertEqual(server.sessions, {})
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,98 @@
+import pickle
+import random
+import unittest
+
+from bitboard import BitboardDalaGame
+from game import DalaGame, Rules
+from state import GameState
+
+from tests.test_game import (TestDraw, get_corner_game, get_end_game,
+                              get_middle_game)
+
+
+class TestGameState(unittest.TestCase):
+    def test_step(self):
+        '''step() must follow DalaGame.apply() exactly'''
+        rng = random.Random(1)
+        for dgame in (DalaGame(), get_middle_game(), get_end_game(),
+                      DalaGame(rules=Rules.get(5, 8)),
+                      DalaGame(rules=Rules.get(8, 16))):
+            for _ in range(3):
+                game = dgame.copy()
+                # states keep no history to draw by
+                game.repetition_limit = game.no_capture_limit = 0
+                state = GameState.from_game(game)
+
+                for _ in range(300):
+                    actions = list(state.legal_actions())
+                    self.assertEqual(set(actions), set(game.legal_actions()))
+                    if not actions:
+                        break
+
+                    action = rng.choice(actions)
+                    game.apply(action)
+                    state = state.step(action)
+
+                    self.assertEqual(state, GameState.from_game(game))
+                    self.assertEqual(state.hash(), game.hash())
+                    self.assertEqual(state.to_game(), game)
+                    self.assertEqual(state.winner(), game.winner())
+                    self.assertEqual(state.game_mode(), game.game_mode())
+
+    def test_conversion(self):
+        '''Conversion must round trip through both backends'''
+        for dgame in (DalaGame(), get_middle_game(), get_end_game(),
+                      DalaGame(rules=Rules.get(5, 8))):
+            state = GameState.from_game(dgame)
+            self.assertEqual(state.board(), dgame.board())
+            self.assertEqual(pickle.loads(pickle.dumps(state)), state)
+
+            for game_class in (DalaGame, BitboardDalaGame):
+                game = state.to_game(game_class)
+                self.assertIsInstance(game, game_class)
+                self.assertEqual(game, dgame)
+                self.assertEqual(GameState.from_game(game), state)
+
+            rebuilt = GameState(state._pieces,
+                                [state.remains(0), state.remains(1)],
+                                [state.lost(0), state.lost(1)],
+                                state.whos_turn(),
+                                rules=state.rules)
+            self.assertEqual(rebuilt, state)
+            self.assertEqual(hash(rebuilt), hash(state))
+
+    def test_draw(self):
+        '''A drawn game must convert to a finished state'''
+        dgame = get_corner_game()
+        for action in TestDraw.shuffle * 2:
+            dgame.apply(action)
+
+        state = GameState.from_game(dgame)
+        self.assertTrue(state.draw())
+        self.assertIsNone(state.winner())
+        self.assertEqual(state.game_mode(), DalaGame.end_mode)
+        self.assertFalse(GameState.from_game(get_corner_game()).draw())
+
+    def test_immutable(self):
+        '''States must reject changes and work as dict keys'''
+        state = GameState.from_game(get_middle_game())
+
+        def change():
+            state._turn = 1
+
+        def delete():
+            del state._hash
+
+        self.assertRaises(AttributeError, change)
+        self.assertRaises(AttributeError, delete)
+        self.assertFalse(hasattr(state, '__dict__'))
+
+        action = next(iter(state.legal_actions()))
+        table = {state: 1, state.step(action): 2}
+        self.assertEqual(table[GameState.from_game(get_middle_game())], 1)
+        self.assertEqual(len(table), 2)
+        self.assertNotEqual(state, state.step(action))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
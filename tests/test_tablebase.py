@@ -0,0 +1,161 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from engine import Engine
+from game import DalaGame, Rules
+from tablebase import LOSS, WIN, Geometry, Tablebase, generate
+
+from tests.test_game import get_end_game
+
+
+class TestTablebase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.geometry = Geometry(size=3, losing_pieces=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_index(self):
+        '''index and position must be inverse of each other'''
+        for fewer, more in ((3, 3), (3, 4)):
+            _, total = self.geometry.parts(fewer, more)
+            for index in range(total):
+                position = self.geometry.position(index, fewer, more)
+                self.assertEqual(self.geometry.index(*position), index)
+
+    def test_consistency(self):
+        '''Every stored result must follow from the results of its children'''
+        generate(self.directory, 4, workers=1, geometry=self.geometry)
+        tablebase = Tablebase(self.directory, self.geometry)
+
+        for fewer, more in ((3, 3), (3, 4), (4, 4)):
+            _, total = self.geometry.parts(fewer, more)
+            for index in range(total):
+                mover, other = self.geometry.position(index, fewer, more)
+                result, distance = tablebase.probe_bits(mover, other)
+
+                children = []
+                for child in self.geometry.successors(mover, other):
+                    if child[0].bit_count() <= self.geometry.losing_pieces:
+                        children.append((LOSS, 0))
+                    else:
+                        children.append(tablebase.probe_bits(*child[:2]))
+
+                losses = [d for r, d in children if r == LOSS]
+                wins = [d for r, d in children if r == WIN]
+
+                if result == WIN:
+                    self.assertEqual(distance, min(losses) + 1)
+                elif result == LOSS:
+                    self.assertEqual(len(wins), len(children))
+                    self.assertEqual(distance, max(wins, default=-1) + 1)
+                else:
+                    self.assertEqual(losses, [])
+                    self.assertLess(len(wins), len(children))
+
+        tablebase.close()
+
+    def test_resume(self):
+        '''Existing files must be kept and missing ones regenerated'''
+        paths = generate(self.directory, 4, workers=2, geometry=self.geometry)
+        contents = [open(path, 'rb').read() for path in paths]
+
+        os.remove(paths[0])
+        os.remove(paths[-1])
+        generate(self.directory, 4, workers=1, geometry=self.geometry)
+        self.assertEqual([open(path, 'rb').read() for path in paths],
+                         contents)
+
+    def test_successors(self):
+        '''Move generation must match DalaGame.legal_actions'''
+        geometry = Geometry()
+        rng = random.Random(1)
+        dgame = get_end_game()
+
+        for _ in range(50):
+            actions = list(dgame.legal_actions())
+            if not actions:
+                break
+
+            bits = [0, 0]
+            for i in range(2):
+                for r, c in dgame._positions_of(i):
+                    bits[i] |= 1 << (r * DalaGame.size + c)
+            player = dgame.whos_turn()
+
+            expected = set()
+            for action in actions:
+                dgame.apply(action)
+                child = [0, 0]
+                for i in range(2):
+                    for r, c in dgame._positions_of(i):
+                        child[i] |= 1 << (r * DalaGame.size + c)
+                expected.add((child[1 - player], child[player]))
+                dgame.undo()
+
+            children = {child[:2]
+                        for child in geometry.successors(bits[player],
+                                                         bits[1 - player])}
+            self.assertEqual(children, expected)
+
+            dgame.apply(rng.choice(actions))
+            if dgame.winner() is not None:
+                break
+
+    def test_probe_game(self):
+        '''Games outside the move phase or without files must not be found'''
+        tablebase = Tablebase(self.directory)
+        self.assertIsNone(tablebase.probe(DalaGame()))
+        self.assertIsNone(tablebase.probe(get_end_game()))
+
+    def test_probe_rules(self):
+        '''Games must only be found in tables of their rules and counts'''
+        generate(self.directory, 3, workers=1, geometry=self.geometry)
+        tablebase = Tablebase(self.directory, self.geometry)
+
+        for rules, found in ((Rules.get(3, 4, lost_condition=2), True),
+                             (Rules.get(3, 4, lost_condition=1), False),
+                             (Rules.get(4, 4, lost_condition=2), False)):
+            board = [[DalaGame.empty] * rules.size for _ in range(rules.size)]
+            for r, c in ((0, 0), (0, 2), (2, 0)):
+                board[r][c] = 0
+            for r, c in ((0, 1), (1, 0), (1, 2)):
+                board[r][c] = 1
+
+            dgame = DalaGame(board=board,
+                             remains=[0, 0],
+                             lost=[rules.num_of_pieces - 3] * 2,
+                             rules=rules)
+            if found:
+                self.assertIsNone(
+                    tablebase.probe(
+                        DalaGame(board=board,
+                                 remains=[0, 0],
+                                 lost=[0, rules.num_of_pieces - 3],
+                                 rules=rules)))
+                self.assertEqual(tablebase.probe(dgame),
+                                 tablebase.probe_bits(0b001000101,
+                                                      0b000101010))
+                self.assertIsNotNone(tablebase.probe(dgame))
+            else:
+                self.assertIsNone(tablebase.probe(dgame))
+
+        tablebase.close()
+
+    def test_engine(self):
+        '''Engine must score tablebase hits by distance to result'''
+
+        class Known(object):
+            def probe(self, game):
+                return (WIN, 4) if game.remains(0) == 0 else None
+
+        result = Engine(tablebase=Known()).search(get_end_game(), 1)
+        self.assertEqual(result.score, -(Engine.win_score - 5))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
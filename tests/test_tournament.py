@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import tournament
+from engine import Engine
+from game import DalaGame
+from mcts import MCTSPlayer
+
+
+class TestTournament(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_players(self):
+        '''Specs must build configured players and reject unknown ones'''
+        player = tournament.make_player('engine:depth=2,time=0.5')
+        self.assertIsInstance(player.engine, Engine)
+        self.assertEqual((player.depth, player.time_limit), (2, 0.5))
+
+        player = tournament.make_player('mcts:iterations=10,workers=2',
+                                        seed=1)
+        self.assertIsInstance(player, MCTSPlayer)
+        self.assertEqual((player.iterations, player.workers), (10, 2))
+
+        action = tournament.make_player('random', 1).best_action(DalaGame())
+        self.assertIn(action, list(DalaGame().legal_actions()))
+
+        self.assertRaises(ValueError, tournament.make_player, 'oracle')
+        self.assertRaises(ValueError, tournament.make_player,
+                          'engine:width=3')
+
+    def test_openings(self):
+        '''Openings must be distinct and reproducible'''
+        openings = tournament.openings(10, 8, seed=3)
+        self.assertEqual(openings, tournament.openings(10, 8, seed=3))
+        self.assertEqual(len(openings), 10)
+
+        keys = set()
+        for actions in openings:
+            game = DalaGame()
+            for action in actions:
+                game.apply(action)
+            self.assertEqual(len(actions), 8)
+            keys.add(game.canonical()[0].hash())
+        self.assertEqual(len(keys), 10)
+
+    def test_statistics(self):
+        '''Elo and SPRT must follow the scores'''
+        self.assertAlmostEqual(tournament.elo([1, 0] * 50)[0], 0)
+        value, low, high = tournament.elo([1, 1, 0.5, 0] * 25)
+        self.assertGreater(value, 0)
+        self.assertLess(low, value)
+        self.assertGreater(high, value)
+        self.assertAlmostEqual(tournament.score_to_elo(
+            tournament.expected_score(100)), 100)
+
+        llr, lower, upper = tournament.sprt([1, 1, 1, 0] * 50, 0, 50)
+        self.assertGreater(llr, upper)
+        llr, lower, upper = tournament.sprt([1, 0, 0, 0] * 50, 0, 50)
+        self.assertLess(llr, lower)
+
+    def test_resume(self):
+        '''A resumed run must only play the missing games'''
+        scores = tournament.run('random', 'random', self.path, pairs=3,
+                                workers=1)
+        self.assertEqual(len(scores), 6)
+        self.assertTrue(all(s in (0, 0.5, 1) for s in scores))
+
+        with open(self.path) as f:
+            lines = f.readlines()
+        with open(self.path, 'w') as f:
+            f.writelines(lines[:-2])
+            f.write(lines[-1][:5])
+
+        resumed = tournament.run('random', 'random', self.path, pairs=3,
+                                 workers=1)
+        self.assertEqual(sorted(resumed), sorted(scores))
+        with open(self.path) as f:
+            self.assertEqual(
+                sorted(json.loads(line)['pair'] for line in f.readlines()[1:]),
+                [0, 0, 1, 1, 2, 2])
+
+        self.assertRaises(ValueError, tournament.run, 'random', 'engine',
+                          self.path, pairs=3, workers=1)
+
+    def test_sprt(self):
+        '''A lopsided match must stop early in the process pool'''
+        scores = tournament.run('engine:depth=1', 'random', self.path,
+                                pairs=100, workers=2, sprt_bounds=(0, 200))
+        self.assertLess(len(scores), 200)
+        llr, lower, upper = tournament.sprt(scores, 0, 200)
+        self.assertGreaterEqual(llr, upper)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
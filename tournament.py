@@ -0,0 +1,328 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from engine import Engine
+from game import DalaGame
+from mcts import MCTSPlayer
+
+
+class RandomPlayer(object):
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def best_action(self, game):
+        actions = list(game.legal_actions())
+        if not actions:
+            return None
+        return self.rng.choice(actions)
+
+
+class EnginePlayer(object):
+    def __init__(self, depth=4, time_limit=None, tt_size=1 << 16):
+        self.engine = Engine(tt_size)
+        self.depth = depth
+        self.time_limit = time_limit
+
+    def best_action(self, game):
+        return self.engine.best_action(game, self.depth, self.time_limit)
+
+    def ponder(self, game):
+        '''search game, where the opponent is to move, to fill the table'''
+        self.engine.search(game, self.depth, self.time_limit)
+
+    def stop(self):
+        self.engine.stop()
+
+    def resume(self):
+        self.engine.resume()
+
+
+def make_player(spec, seed=None):
+    '''build a player from a spec such as 'engine:depth=3,time=0.1'
+
+    Known players are random, engine (depth, time, tt) and mcts
+    (iterations, time, workers, exploration, playout). Players with a
+    close() method hold resources until it is called.
+    '''
+
+    name, _, options = spec.partition(':')
+    kwargs = {}
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        kwargs[key] = float(value)
+
+    def option(key, default, cast=float):
+        value = kwargs.pop(key, None)
+        return default if value is None else cast(value)
+
+    if name == 'random':
+        player = RandomPlayer(seed)
+    elif name == 'engine':
+        player = EnginePlayer(option('depth', 4, int), option('time', None),
+                              option('tt', 1 << 16, int))
+    elif name == 'mcts':
+        player = MCTSPlayer(option('iterations', 1000, int),
+                            option('time', None),
+                            option('workers', 1, int),
+                            exploration=option('exploration', 1.4),
+                            playout_limit=option('playout', 200, int),
+                            seed=seed)
+    else:
+        raise ValueError('Unknown player: ' + spec)
+
+    if kwargs:
+        raise ValueError('Unknown options for {}: {}'.format(
+            name, ', '.join(sorted(kwargs))))
+    return player
+
+
+def openings(count, plies, seed=0):
+    '''count distinct random action sequences of plies actions'''
+
+    rng = random.Random(seed)
+    seen = set()
+    result = []
+    for _ in range(count * 100):
+        if len(result) == count:
+            break
+
+        game = DalaGame()
+        actions = []
+        for _ in range(plies):
+            legal = list(game.legal_actions())
+            if not legal:
+                break
+            actions.append(rng.choice(legal))
+            game.apply(actions[-1])
+
+        key = game.canonical()[0].hash()
+        if game.game_mode() != DalaGame.end_mode and key not in seen:
+            seen.add(key)
+            result.append(actions)
+
+    return result
+
+
+def play_game(job):
+    '''play one game and return the score of the first spec
+
+    The first spec plays player 0 unless swapped. Draws and games still
+    undecided after max_plies score 0.5.
+    '''
+
+    first, second, opening, swapped, max_plies, seed = job
+
+    rng = random.Random(seed)
+    players = [make_player(first, rng.getrandbits(32)),
+               make_player(second, rng.getrandbits(32))]
+    if swapped:
+        players.reverse()
+
+    game = DalaGame()
+    for action in opening:
+        game.apply(action)
+
+    try:
+        for _ in range(max_plies):
+            if game.game_mode() == DalaGame.end_mode:
+                break
+            action = players[game.whos_turn()].best_action(game)
+            if action is None:
+                break
+            game.apply(action)
+    finally:
+        for player in players:
+            if hasattr(player, 'close'):
+                player.close()
+
+    winner = game.winner()
+    if winner is None:
+        return 0.5
+
+    first_player = 1 if swapped else 0
+    return 1.0 if winner == first_player else 0.0
+
+
+def expected_score(elo):
+    return 1 / (1 + 10**(-elo / 400.0))
+
+
+def score_to_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo(scores, z=1.96):
+    '''return (elo, low, high) with a normal confidence interval'''
+
+    n = len(scores)
+    if n == 0:
+        return 0.0, -math.inf, math.inf
+
+    mean = sum(scores) / n
+    variance = sum((s - mean)**2 for s in scores) / n
+    margin = z * math.sqrt(variance / n)
+    return (score_to_elo(mean), score_to_elo(mean - margin),
+            score_to_elo(mean + margin))
+
+
+def sprt(scores, elo0, elo1, alpha=0.05, beta=0.05):
+    '''return (llr, lower, upper) of the test of elo0 against elo1
+
+    The log-likelihood ratio uses the normal approximation of the game
+    scores; H1 is accepted once llr >= upper and H0 once llr <= lower.
+    '''
+
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+
+    n = len(scores)
+    if n == 0:
+        return 0.0, lower, upper
+
+    mean = sum(scores) / n
+    variance = sum((s - mean)**2 for s in scores) / n
+    if variance == 0:
+        return 0.0, lower, upper
+
+    s0 = expected_score(elo0)
+    s1 = expected_score(elo1)
+    llr = n * ((mean - s0)**2 - (mean - s1)**2) / (2 * variance)
+    return llr, lower, upper
+
+
+def run(first,
+        second,
+        path,
+        pairs=100,
+        plies=8,
+        max_plies=400,
+        workers=None,
+        seed=0,
+        sprt_bounds=None,
+        alpha=0.05,
+        beta=0.05):
+    '''play pairs of colour-swapped games, appending results to path
+
+    Games already recorded in path are not played again. With sprt_bounds
+    (elo0, elo1) no further games are started once the test is decided.
+    Return the scores of first, in the order they were recorded.
+    '''
+
+    config = {
+        'first': first,
+        'second': second,
+        'plies': plies,
+        'max_plies': max_plies,
+        'seed': seed
+    }
+    done = {}
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, 'r+') as f:
+            data = f.read()
+            # drop a line cut short by an interrupted run
+            end = data.rfind('\n') + 1
+            f.truncate(end)
+
+        lines = data[:end].splitlines()
+        if not lines or json.loads(lines[0]) != config:
+            raise ValueError('Results of a different tournament: ' + path)
+        for line in lines[1:]:
+            record = json.loads(line)
+            done[(record['pair'], record['swapped'])] = record['score']
+    else:
+        with open(path, 'w') as f:
+            f.write(json.dumps(config, sort_keys=True) + '\n')
+
+    rng = random.Random(seed)
+    jobs = []
+    for pair, opening in enumerate(openings(pairs, plies, seed)):
+        for swapped in (False, True):
+            game_seed = rng.getrandbits(32)
+            if (pair, swapped) not in done:
+                jobs.append(((pair, swapped),
+                             (first, second, opening, swapped, max_plies,
+                              game_seed)))
+
+    scores = list(done.values())
+
+    def decided():
+        if sprt_bounds is None:
+            return False
+        llr, lower, upper = sprt(scores, sprt_bounds[0], sprt_bounds[1],
+                                 alpha, beta)
+        return llr <= lower or llr >= upper
+
+    with open(path, 'a') as f:
+
+        def record(key, score):
+            scores.append(score)
+            f.write(json.dumps({'pair': key[0], 'swapped': key[1],
+                                'score': score}) + '\n')
+            f.flush()
+
+        if workers == 1:
+            for key, job in jobs:
+                if decided():
+                    break
+                record(key, play_game(job))
+            return scores
+
+        limit = 2 * (workers or os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers) as executor:
+            pending = {}
+            jobs.reverse()
+            while jobs or pending:
+                while jobs and len(pending) < limit and not decided():
+                    key, job = jobs.pop()
+                    pending[executor.submit(play_game, job)] = key
+
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(pending.pop(future), future.result())
+
+    return scores
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Play two Dala players against each other')
+    parser.add_argument('first', help='e.g. engine:depth=3 or mcts:time=0.1')
+    parser.add_argument('second')
+    parser.add_argument('--results', default='tournament.jsonl')
+    parser.add_argument('--pairs', type=int, default=100)
+    parser.add_argument('--plies', type=int, default=8)
+    parser.add_argument('--max-plies', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sprt',
+                        type=float,
+                        nargs=2,
+                        metavar=('ELO0', 'ELO1'))
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    args = parser.parse_args()
+
+    scores = run(args.first, args.second, args.results, args.pairs, args.plies,
+                 args.max_plies, args.workers, args.seed, args.sprt,
+                 args.alpha, args.beta)
+
+    value, low, high = elo(scores)
+    print('{} games, score {:.3f}, elo {:+.1f} [{:+.1f}, {:+.1f}]'.format(
+        len(scores),
+        sum(scores) / max(len(scores), 1), value, low, high))
+    if args.sprt:
+        llr, lower, upper = sprt(scores, args.sprt[0], args.sprt[1],
+                                 args.alpha, args.beta)
+        verdict = ('H1 accepted' if llr >= upper else
+                   'H0 accepted' if llr <= lower else 'undecided')
+        print('SPRT llr {:.2f} [{:.2f}, {:.2f}]: {}'.format(
+            llr, lower, upper, verdict))